@@ -1,11 +1,99 @@
-from flask import Flask, render_template, request, make_response, jsonify
+from flask import Flask, render_template, request, make_response, jsonify, url_for
+from flask import Response, g, stream_with_context
 import database.database_controller as db
-import requests
-from datetime import datetime
-from visualizations.visualize import TSAVisualization
+from database.export import EXPORT_FORMATS, export_query, get_processed_collection, stream_export
+import os
+import threading
+import time
+from instrumentation import profiling
+from instrumentation.metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSE_BYTES, REGISTRY
+from visualizations.loader import LazyVisualization
+from visualizations.figure_cache import FigureCache
+from visualizations.encoding import compress, negotiate_encoding
+from optimization.jobs import OptimizationJobs, QueueFullError
+from optimization.catalog import AlgorithmCatalog
 
 application = Flask(__name__)
-tsva = TSAVisualization()
+# processed results are loaded in the background or on first use
+tsva = LazyVisualization()
+figure_cache = FigureCache(max_entries=128, max_bytes=64 * 2**20)
+if os.environ.get("TSA_ASYNC", "0") == "1":
+    # optimizations wait on the optimizer in an event loop, not a thread each
+    from optimization.async_jobs import AsyncOptimizationJobs
+
+    optimization_jobs = AsyncOptimizationJobs(max_pending=1000)
+    algorithm_catalog = AlgorithmCatalog(
+        fallback=db.RUN_STRATEGIES, fetch=optimization_jobs.algo_list
+    )
+else:
+    optimization_jobs = OptimizationJobs(max_workers=4, max_pending=32)
+    # falls back to the strategies processed results are parsed for
+    algorithm_catalog = AlgorithmCatalog(fallback=db.RUN_STRATEGIES)
+
+# the warm-up threads are started by the first request instead of at import,
+# so a pre-forking server starts them in its workers rather than the master
+warm_up_pending = os.environ.get("TSA_WARM_UP", "1") != "0"
+warm_up_lock = threading.Lock()
+
+
+@REGISTRY.register_collector
+def figure_cache_metrics():
+    # read from the cache's own counters when /metrics is rendered
+    return [
+        ("tsa_figure_cache_hits_total", "counter", "Figure cache hits", {(): figure_cache.hits}),
+        ("tsa_figure_cache_misses_total", "counter", "Figure cache misses", {(): figure_cache.misses}),
+        ("tsa_figure_cache_entries", "gauge", "Figures in the cache", {(): len(figure_cache)}),
+        ("tsa_figure_cache_bytes", "gauge", "Bytes of figures in the cache", {(): figure_cache.size_bytes}),
+    ]
+
+
+@application.before_request
+def start_warm_up():
+    global warm_up_pending
+    if not warm_up_pending:
+        return
+    with warm_up_lock:
+        if not warm_up_pending:
+            return
+        warm_up_pending = False
+    tsva.warm_up()
+    algorithm_catalog.warm_up()
+
+
+@application.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = profiling.start()
+
+
+def request_route() -> str:
+    # routes are labeled by their rule, so path parameters don't add labels
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+@application.after_request
+def record_request_metrics(response):
+    route = request_route()
+
+    # streamed responses are timed until their first byte
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_start,
+        route=route,
+        method=request.method,
+        status=response.status_code,
+    )
+    if response.content_length is not None:
+        HTTP_RESPONSE_BYTES.inc(response.content_length, route=route)
+    return response
+
+
+@application.teardown_request
+def stop_request_profiler(exception=None):
+    # unlike after_request, also runs when the view raised, so the profiler is
+    # always released
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiling.stop(profiler, request_route())
 
 
 # dash_app.plot_drawdown_vs_return(application)
@@ -14,29 +102,77 @@ tsva = TSAVisualization()
 
 @application.route("/")
 def index():
-    url = "http://18.222.8.195:5000/algo_list"
-    response = requests.get(url)
-    if response.status_code == 200:
-        algorithm_labels = response.json()
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-    return render_template("index.html", labels=algorithm_labels)
+    # served from memory, the list is refreshed from the optimizer in the background
+    return render_template("index.html", labels=algorithm_catalog.labels())
 
 
 @application.route("/optimize", methods=["GET"])
 def get_prior_runs():
-    return db.get_prior_runs(10)
+    # example request, for the dropdown labels and the next page of runs
+    # http://127.0.0.1:8080/optimize?summary=1&limit=10&before=2023-07-01T12:00:00
+    limit = min(request.args.get("limit", 10, type=int), 100)
+    summary = request.args.get("summary", "0") not in ("", "0", "false")
+
+    try:
+        before = request.args.get("before")
+        before = db.parse_timestamp(before) if before else None
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    if summary:
+        runs = db.get_prior_run_summaries(limit, before)
+        # ISO timestamps keep the milliseconds of the _id, for use in URLs
+        for run in runs:
+            run["_id"] = run["_id"].isoformat()
+    else:
+        runs = db.get_prior_runs(limit, before)
+
+    response = jsonify(runs)
+    # a full page may be followed by older runs
+    if len(runs) == limit:
+        last = runs[-1]["_id"]
+        response.headers.set(
+            "Link",
+            '<{}>; rel="next"'.format(
+                url_for(
+                    "get_prior_runs",
+                    limit=limit,
+                    summary=int(summary),
+                    before=last if summary else last.isoformat(),
+                )
+            ),
+        )
+    return response
 
 
 @application.route("/optimize/<timestamp>", methods=["GET"])
 def get_timestamp_results(timestamp):
-    return db.get_run(timestamp)
+    try:
+        run = db.get_run(timestamp)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    if run is None:
+        return {"status": "error", "message": "Unknown run"}, 404
+    return run
+
+
+@application.route("/optimize/<timestamp>/<path:strategy>", methods=["GET"])
+def get_timestamp_strategy_results(timestamp, strategy):
+    # results of a single strategy, e.g. /optimize/2023-07-01T12:00:00/Exp/Con
+    try:
+        run = db.get_run_strategy(timestamp, strategy)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    if run is None:
+        return {"status": "error", "message": "Unknown run or strategy"}, 404
+    return run
 
 
 @application.route("/optimize", methods=["POST"])
 def run_optimization():
     parameters = request.get_json()
-    accept_types: list[str] = request.accept_mimetypes
 
     if (
             "ticker" in parameters
@@ -52,7 +188,6 @@ def run_optimization():
         end_date = parameters["endDate"]
         selected_algos = parameters["selectedAlgos"]
 
-        url = "http://18.222.8.195:5000/optimize" # got it working on a microservice :')
         data = {
             "ticker": ticker,
             "population_size": population_size,
@@ -62,44 +197,104 @@ def run_optimization():
             "selected_algos": selected_algos
         }
 
-        response = requests.post(url, json=data)
-        optimized_results = response.json()
-        date_format = '%a, %d %b %Y %H:%M:%S GMT'
+        # the optimization runs in the background, poll the job for its results
+        try:
+            job_id = optimization_jobs.submit(data)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        except QueueFullError as e:
+            return {"status": "error", "message": str(e)}, 503
 
-        optimized_results['inputs']['_id'] = datetime.strptime(optimized_results['inputs']['_id'], date_format)
-        if optimized_results and len(optimized_results) > 0:
-            db.add_results(optimized_results,
-                           optimized_results['inputs']['_id'])
+        response = jsonify({"job_id": job_id, "status": "queued"})
+        response.headers.set("Location", url_for("get_job", job_id=job_id))
+        response.status_code = 202
+        return response
 
-            if "text/html" in accept_types:
-                html_results = render_template(
-                    "backtest.jinja", data=optimized_results
-                )
-                response = make_response(html_results)
-                response.headers.set("Content-Type", "text/html")
-                response.status_code = 201
-                return response
+    else:
+        return {"status": "error", "message": "Missing optimization inputs"}, 400
+
+
+@application.route("/leaderboard", methods=["GET"])
+def get_leaderboard():
+    # example requests, the best run of each strategy or the top runs of one
+    # http://127.0.0.1:8080/leaderboard?ticker=TQQQ
+    # http://127.0.0.1:8080/leaderboard?ticker=TQQQ&strategy=Breakout&limit=10
+    ticker = request.args.get("ticker")
+    strategy = request.args.get("strategy")
+    if not ticker:
+        return {"status": "error", "message": "Missing ticker"}, 400
+
+    if strategy:
+        limit = min(request.args.get("limit", 10, type=int), 100)
+        summaries = db.get_best_runs(ticker, strategy, limit)
+    else:
+        summaries = list(db.get_leaderboard(ticker).values())
+
+    for summary in summaries:
+        summary["run_id"] = summary["run_id"].isoformat()
+    return jsonify(summaries)
+
+
+@application.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = optimization_jobs.get(job_id)
+    if job is None:
+        return {"status": "error", "message": "Unknown job"}, 404
+
+    job["job_id"] = job.pop("_id")
+    return jsonify(job)
+
+
+@application.route("/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    accept_types: list[str] = request.accept_mimetypes
+    job = optimization_jobs.get(job_id)
+
+    if job is None:
+        return {"status": "error", "message": "Unknown job"}, 404
 
-            elif "application/json" in accept_types:
-                response = jsonify(optimized_results)
-                response.headers.set("Content-Type", "application/json")
-                response.status_code = 201
-                return response
+    if job["status"] == "failed":
+        return {"status": "failed", "message": job.get("error")}, 500
 
-            else:
-                return 406
+    if job["status"] != "done":
+        return {"status": job["status"]}, 202
 
-        else:
-            return 400
+    optimized_results = db.get_run(job["result_id"])
+
+    if "text/html" in accept_types:
+        html_results = render_template(
+            "backtest.jinja", data=optimized_results
+        )
+        response = make_response(html_results)
+        response.headers.set("Content-Type", "text/html")
+        return response
+
+    elif "application/json" in accept_types:
+        response = jsonify(optimized_results)
+        response.headers.set("Content-Type", "application/json")
+        return response
 
     else:
-        return 400
+        return {"status": "error", "message": "Not acceptable"}, 406
+
+
+@application.route("/ready", methods=["GET"])
+def ready():
+    # readiness of the analytics data, for load balancer health checks
+    status = tsva.status()
+    return status, 200 if status["ready"] else 503
+
+
+@application.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text exposition format
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 
 @application.route('/analyze')
 def analyze():
-    # Get unique ticker values from tsva.data
-    unique_tickers = list(tsva.data['ticker'].unique())
+    # Get unique ticker values from the analytics store
+    unique_tickers = tsva.get().store.tickers()
 
     return render_template("visualize.html", unique_tickers=unique_tickers)
 
@@ -110,39 +305,89 @@ def render_analyze():
 
     # example request
     # http://127.0.0.1:8080/visualize?type=ParamReturn&ticker=TQQQ&strategy=Breakout
+    # with format=binary, numeric arrays are sent as base64 typed arrays
     plot_type = request.args.get("type", None)
     ticker = request.args.get("ticker", None)
     strategy = request.args.get("strategy", None)
+    binary = request.args.get("format", "json") == "binary"
+    visualization = tsva.get()
+    # read once, so the figure is built from the data version it is cached under
+    snapshot = visualization.snapshot
 
+    # only keep the arguments the plot type uses, so equal figures share an entry
     if plot_type == "ParamReturn":
-        graphJSON = tsva.plot_params_vs_return(
-            ticker=ticker, strategy=strategy
-        )
-
+        key = (plot_type, ticker, strategy, snapshot.version, binary)
     elif plot_type == "DrawdownReturn":
-        graphJSON = tsva.plot_drawdown_vs_return(ticker=ticker)
+        key = (plot_type, ticker, None, snapshot.version, binary)
+    elif plot_type in ("Features", "TradesReturn"):
+        key = (plot_type, None, None, snapshot.version, binary)
+    else:
+        return {"status": "error", "message": f"Unknown plot type {plot_type}"}, 400
+
+    # every content encoding is a representation with its own ETag and entry
+    content_encoding = negotiate_encoding(request.accept_encodings)
+    encoded_key = key + (content_encoding,)
+
+    etag = figure_cache.etag(encoded_key)
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    payload = None
+    if content_encoding != "identity":
+        payload = figure_cache.get(encoded_key)
+    if payload is None:
+        graphJSON = figure_cache.get(key)
+        if graphJSON is None:
+            if plot_type == "ParamReturn":
+                graphJSON = visualization.plot_params_vs_return(
+                    ticker=ticker, strategy=strategy, binary=binary, snapshot=snapshot
+                )
+
+            elif plot_type == "DrawdownReturn":
+                graphJSON = visualization.plot_drawdown_vs_return(
+                    ticker=ticker, binary=binary, snapshot=snapshot
+                )
+
+            elif plot_type == "Features":
+                graphJSON = visualization.plot_feature_importance(
+                    binary=binary, snapshot=snapshot
+                )
 
-    elif plot_type == "Features":
-        graphJSON = tsva.plot_feature_importance()
+            elif plot_type == "TradesReturn":
+                graphJSON = visualization.plot_trades_vs_return(
+                    binary=binary, snapshot=snapshot
+                )
+
+            figure_cache.put(key, graphJSON)
 
-    elif plot_type == "TradesReturn":
-        graphJSON = tsva.plot_trades_vs_return()
+        payload = compress(graphJSON, content_encoding)
+        if content_encoding != "identity":
+            figure_cache.put(encoded_key, payload)
 
-    return graphJSON
+    response = make_response(payload)
+    response.headers.set("Content-Type", "application/json")
+    if content_encoding != "identity":
+        response.headers.set("Content-Encoding", content_encoding)
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    return response
 
 
 @application.route('/update_results', methods=['POST'])
 def update_results():
     try:
-        # Import necessary function from database_controller.py
-        from database.database_controller import ResultsProcessing
+        # Update processed_results and reload the data the graphs are built from
+        visualization = tsva.get()
+        visualization.update_data()
 
-        # Create an instance of ResultsProcessing and call the update_processed_results method
-        results_processor = ResultsProcessing()
-        results_processor.update_processed_results()
+        # Figures of older data versions can no longer be requested
+        figure_cache.clear()
 
         # Get the updated unique tickers
-        unique_tickers = list(tsva.data['ticker'].unique())
+        unique_tickers = visualization.store.tickers()
 
         # Return a response with the updated tickers
         return {'status': 'success', 'message': 'Processed results updated successfully', 'tickers': unique_tickers}
@@ -151,5 +396,44 @@ def update_results():
         return {'status': 'error', 'message': str(e)}
 
 
+@application.route("/export", methods=["GET"])
+def export_results():
+    # example request
+    # http://127.0.0.1:8080/export?format=csv&ticker=TQQQ&strategy=Breakout&start_date=2011-01-01
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return {"status": "error", "message": f"Unknown format {export_format}"}, 400
+
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return {"status": "error", "message": "Parquet export needs pyarrow"}, 501
+
+    try:
+        query = export_query(
+            ticker=request.args.get("ticker"),
+            strategy=request.args.get("strategy"),
+            start_date=request.args.get("start_date"),
+            end_date=request.args.get("end_date"),
+        )
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    # rows are read and encoded one batch at a time while the response is sent
+    response = Response(
+        stream_with_context(
+            stream_export(get_processed_collection(), export_format, query)
+        ),
+        mimetype=EXPORT_FORMATS[export_format],
+    )
+    response.headers.set(
+        "Content-Disposition",
+        "attachment",
+        filename=f"processed_results.{export_format}",
+    )
+    return response
+
+
 if __name__ == "__main__":
     application.run(host="127.0.0.1", port=8080, debug=True)
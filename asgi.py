@@ -0,0 +1,18 @@
+"""
+ASGI entry point, e.g.:  uvicorn asgi:app --host 0.0.0.0 --port 8080
+
+Runs the application with optimizations on an event loop (TSA_ASYNC=1, see
+optimization.async_jobs) behind an ASGI server. Requests are answered by the
+Flask routes in the server's thread pool; none of them waits on the optimizer.
+Needs asgiref, httpx and an ASGI server such as uvicorn, and motor for async
+database writes.
+"""
+import os
+
+os.environ.setdefault("TSA_ASYNC", "1")
+
+from asgiref.wsgi import WsgiToAsgi  # noqa: E402
+
+from application import application  # noqa: E402
+
+app = WsgiToAsgi(application)
@@ -0,0 +1,88 @@
+from credentials import db_credentials
+
+
+# backends benchmarks can run against
+BACKENDS = ["mongomock", "mongod"]
+
+# a local mongod started with default options
+DEFAULT_MONGOD_URI = "mongodb://127.0.0.1:27017"
+
+# collections benchmarks fill and empty
+COLLECTIONS = ["collection", "collection2", "collection3", "collection4", "collection5"]
+
+
+def use_mongomock():
+    """
+    Points the shared database client at an in-memory mongomock database and
+    returns the database. Needs the mongomock package.
+    """
+    import mongomock
+
+    from database.connection import get_db, set_client
+
+    set_client(mongomock.MongoClient())
+    return get_db()
+
+
+def use_mongod(uri: str = DEFAULT_MONGOD_URI):
+    """
+    Points the shared database client at a local mongod and returns the
+    database. Benchmarks empty the collections they use, so Atlas (mongodb+srv)
+    addresses are refused.
+    """
+    from pymongo import MongoClient
+
+    from database.connection import get_db, set_client
+
+    if uri.startswith("mongodb+srv://"):
+        raise ValueError("Benchmarks only run against a local mongod")
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    # fail here rather than in the first benchmark
+    client.admin.command("ping")
+    set_client(client)
+    return get_db()
+
+
+def use_backend(backend: str, uri: str = None):
+    """
+    Returns the database of the named backend, see BACKENDS.
+    """
+    if backend == "mongomock":
+        return use_mongomock()
+    if backend == "mongod":
+        return use_mongod(uri or DEFAULT_MONGOD_URI)
+    raise ValueError(f"Unknown backend {backend}")
+
+
+def reset(db):
+    # empties every collection the application uses
+    for name in COLLECTIONS:
+        db[db_credentials[name]].drop()
+
+
+def load_runs(runs, batch_size: int = 1000) -> int:
+    """
+    Stores Results documents with add_many_results, which also writes their
+    run summaries, and returns how many were stored.
+
+    Parameters
+    runs: iterable of dict
+        Results documents, e.g. from benchmarks.synthetic.iter_runs
+    batch_size: int
+        Documents stored per call
+    """
+    import database.database_controller as db
+
+    count = 0
+    batch = []
+    for run in runs:
+        batch.append(run)
+        if len(batch) == batch_size:
+            db.add_many_results(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.add_many_results(batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,55 @@
+"""
+Benchmarks the memory footprint and per-ticker lookups of the analytics store
+against filtering the whole processed results DataFrame.
+
+Usage: python -m benchmarks.bench_analytics_store [--runs 10000]
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import generate_processed_results
+from visualizations.analytics_store import AnalyticsStore
+
+
+def megabytes(num_bytes: int) -> str:
+    return f"{num_bytes / 2**20:8.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    data = generate_processed_results(args.runs)
+    before = int(data.memory_usage(deep=True).sum())
+
+    start = time.perf_counter()
+    store = AnalyticsStore(data)
+    build_time = time.perf_counter() - start
+    after = store.memory_usage()
+
+    print(f"{len(data)} rows")
+    print(f"memory  DataFrame: {megabytes(before)}  store: {megabytes(after)}")
+    print(f"store build: {build_time:.3f}s")
+
+    tickers = store.tickers()
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        ticker = tickers[i % len(tickers)]
+        data[(data["ticker"] == ticker) & (data["strategy"] == "Breakout")]
+    mask_time = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        store.for_group(tickers[i % len(tickers)], "Breakout")
+    store_time = (time.perf_counter() - start) / args.repeat
+
+    print(
+        f"(ticker, strategy) lookup  mask: {mask_time * 1000:.3f} ms"
+        f"  store: {store_time * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmarks scoring a whole genetic algorithm population with one batched call
+against backtesting each individual on its own.
+
+Usage: python -m benchmarks.bench_batch_fitness [--population 100 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate_ohlcv
+from database.schema import STRATEGY_PARAMS
+from optimization.backtest import backtest, evaluate
+from optimization.genetic import PARAM_BOUNDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--population", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--days", type=int, default=3100)
+    parser.add_argument(
+        "--baseline-max",
+        type=int,
+        default=200,
+        help="individuals backtested one by one for the baseline",
+    )
+    args = parser.parse_args()
+
+    bars = generate_ohlcv(args.days)
+    prices = {
+        "high": bars["High"].to_numpy(),
+        "low": bars["Low"].to_numpy(),
+        "close": bars["Close"].to_numpy(),
+    }
+    rng = np.random.default_rng(0)
+
+    for strategy, names in STRATEGY_PARAMS.items():
+        low = [PARAM_BOUNDS[name][0] for name in names]
+        high = [PARAM_BOUNDS[name][1] for name in names]
+
+        for size in args.population:
+            population = rng.uniform(low, high, size=(size, len(names)))
+
+            start = time.perf_counter()
+            evaluate(prices, strategy, population)
+            batched = size / (time.perf_counter() - start)
+
+            baseline_size = min(size, args.baseline_max)
+            start = time.perf_counter()
+            for individual in population[:baseline_size]:
+                backtest(prices, strategy, dict(zip(names, individual)))
+            single = baseline_size / (time.perf_counter() - start)
+
+            print(
+                f"{strategy:>12}  population {size:>5}"
+                f"  batched: {batched:9.0f} evals/s"
+                f"  per individual: {single:9.0f} evals/s"
+                f"  speedup: {batched / single:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmarks concurrent optimizations against the stub optimizer, run by the
+thread pool of OptimizationJobs and by the event loop of AsyncOptimizationJobs,
+while run history lookups are served alongside.
+
+Every optimization takes --delay seconds on the stub, so the ideal time to
+finish them all is one delay. Runs against an in-memory mongomock database
+(needs mongomock, and httpx for the async jobs). motor can't use mongomock, so
+the async jobs write to it from worker threads here.
+
+Usage: python -m benchmarks.bench_concurrency [--optimizations 16 64]
+    [--delay 1] [--workers 4] [--lookups 8]
+"""
+import argparse
+import itertools
+import logging
+import os
+import statistics
+import threading
+import time
+
+from benchmarks.backend import load_runs, use_mongomock
+from benchmarks.stub_optimizer import serve_in_thread
+from benchmarks.synthetic import iter_runs
+from database.schema import STRATEGY_PARAMS
+
+# seconds between checks of the jobs' status
+POLL_INTERVAL = 0.05
+
+
+def run(application, jobs, num_optimizations: int, lookups: int, counter) -> dict:
+    client = application.application.test_client()
+    application.optimization_jobs = jobs
+    latencies = []
+    done = threading.Event()
+
+    def look_up():
+        lookup_client = application.application.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            lookup_client.get("/optimize?summary=1&limit=10")
+            latencies.append(time.perf_counter() - start)
+
+    lookup_threads = [threading.Thread(target=look_up) for _ in range(lookups)]
+    for thread in lookup_threads:
+        thread.start()
+
+    start = time.perf_counter()
+    job_ids = []
+    for _ in range(num_optimizations):
+        response = client.post(
+            "/optimize",
+            json={
+                "ticker": "TQQQ",
+                "populationSize": 10,
+                # distinct inputs, so no job is shared
+                "generations": next(counter),
+                "startDate": "2015-01-01",
+                "endDate": "2020-01-01",
+                "selectedAlgos": [True] * len(STRATEGY_PARAMS),
+            },
+        )
+        job_ids.append(response.get_json()["job_id"])
+
+    peak_threads = 0
+    pending = set(job_ids)
+    failed = 0
+    while pending:
+        peak_threads = max(peak_threads, threading.active_count())
+        for job_id in list(pending):
+            status = jobs.get(job_id)["status"]
+            if status in ("done", "failed"):
+                pending.discard(job_id)
+                failed += status == "failed"
+        time.sleep(POLL_INTERVAL)
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    for thread in lookup_threads:
+        thread.join()
+
+    latencies = sorted(latencies) or [float("nan")]
+    return {
+        "elapsed": elapsed,
+        "failed": failed,
+        # every thread of the process, the lookups' and the stub's included
+        "peak_threads": peak_threads,
+        "lookup_median": statistics.median(latencies),
+        "lookup_p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--optimizations", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds per optimization")
+    parser.add_argument("--workers", type=int, default=4, help="threads of OptimizationJobs")
+    parser.add_argument("--lookups", type=int, default=8, help="concurrent history lookups")
+    args = parser.parse_args()
+
+    use_mongomock()
+    load_runs(iter_runs(200))
+
+    from optimization import optimizer_client
+
+    # the stub's request log would interleave with the results
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    optimizer_url, stub = serve_in_thread(args.delay)
+    optimizer_client.OPTIMIZER_URL = optimizer_url
+    os.environ["TSA_WARM_UP"] = "0"
+
+    import application
+    from optimization.async_jobs import AsyncOptimizationJobs
+    from optimization.jobs import OptimizationJobs
+
+    counter = itertools.count(1)
+    print(
+        f"{'jobs':6} {'optimizations':>13} {'elapsed':>8} {'ideal':>6}"
+        f" {'threads':>8} {'lookup p50':>11} {'lookup p95':>11} {'failed':>6}"
+    )
+    for num_optimizations in args.optimizations:
+        for name in ["threads", "async"]:
+            if name == "threads":
+                jobs = OptimizationJobs(
+                    max_workers=args.workers, max_pending=num_optimizations, memo_ttl=None
+                )
+            else:
+                jobs = AsyncOptimizationJobs(max_pending=num_optimizations, memo_ttl=None)
+
+            result = run(application, jobs, num_optimizations, args.lookups, counter)
+            jobs.shutdown()
+            print(
+                f"{name:6} {num_optimizations:13} {result['elapsed']:7.2f}s"
+                f" {args.delay:5.1f}s {result['peak_threads']:8}"
+                f" {result['lookup_median'] * 1000:9.1f}ms"
+                f" {result['lookup_p95'] * 1000:9.1f}ms {result['failed']:6}"
+            )
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmarks the payload size and serialization time of every /graph plot type,
+as plain JSON and with base64 typed arrays, uncompressed and compressed.
+
+Runs against an in-memory mongomock database filled with synthetic processed
+results.
+
+Usage: python -m benchmarks.bench_figure_payload [--runs 2000]
+"""
+import argparse
+import time
+
+from benchmarks.backend import use_mongomock
+from benchmarks.synthetic import generate_processed_results
+from credentials import db_credentials
+from visualizations.encoding import CONTENT_ENCODINGS, compress
+
+
+def kilobytes(num_bytes: int) -> str:
+    return f"{num_bytes / 2**10:9.0f} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = use_mongomock()
+    rows = generate_processed_results(args.runs).reset_index().to_dict("records")
+    db[db_credentials["collection2"]].insert_many(rows)
+
+    from visualizations.visualize import TSAVisualization
+
+    tsva = TSAVisualization()
+    ticker = tsva.store.tickers()[0]
+    print(f"{len(rows)} rows, {len(tsva.store.for_ticker(ticker))} for {ticker}")
+
+    plots = {
+        "ParamReturn": lambda binary: tsva.plot_params_vs_return(
+            ticker, "Breakout", binary=binary
+        ),
+        "DrawdownReturn": lambda binary: tsva.plot_drawdown_vs_return(
+            ticker, binary=binary
+        ),
+        "Features": lambda binary: tsva.plot_feature_importance(binary=binary),
+        "TradesReturn": lambda binary: tsva.plot_trades_vs_return(binary=binary),
+    }
+
+    print(
+        f"{'plot':15} {'format':7} {'build':>8} {'identity':>12}"
+        + "".join(f" {encoding:>12} {'time':>8}" for encoding in CONTENT_ENCODINGS)
+    )
+    for name, plot in plots.items():
+        # fits the feature importances and warms the rollups outside the timings
+        plot(False)
+
+        for binary in (False, True):
+            start = time.perf_counter()
+            payload = plot(binary)
+            build_time = time.perf_counter() - start
+
+            line = (
+                f"{name:15} {'binary' if binary else 'json':7}"
+                f" {build_time * 1000:6.0f}ms {kilobytes(len(payload.encode()))}"
+            )
+            for encoding in CONTENT_ENCODINGS:
+                start = time.perf_counter()
+                compressed = compress(payload, encoding)
+                line += (
+                    f" {kilobytes(len(compressed))}"
+                    f" {(time.perf_counter() - start) * 1000:6.0f}ms"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmarks flattening of Results documents into processed_results rows.
+
+Usage: python -m benchmarks.bench_parse_data [--runs 1000 10000 100000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_runs
+from database.flatten import (
+    INPUT_FIELDS,
+    RESULT_FIELDS,
+    INPUT_COLUMNS,
+    RESULT_COLUMNS,
+    flatten_runs,
+    iter_strategy_runs,
+)
+from database.schema import STRATEGY_PARAMS
+
+
+def legacy_parse_data(data: pd.DataFrame, strategy: str) -> pd.DataFrame:
+    # row-by-row implementation that parse_data used before, kept for comparison
+    cols_to_drop = ["_id", "Acceleration", "Breakout", "Exp/Con", "Velocity"]
+    cols_to_drop.remove(strategy)
+    input_df = data.drop(cols_to_drop, axis=1).dropna().reset_index(drop=True)
+
+    parsed_df = pd.DataFrame()
+    for idx in range(len(input_df.index) - 1):
+        new_input_row = (
+            pd.DataFrame(input_df["inputs"][idx], index=[0])
+            .reset_index(drop=True)
+            .drop(["_id"], axis=1)
+        )
+        new_input_row = new_input_row[INPUT_FIELDS]
+
+        for key in input_df[strategy][idx]["results"].keys():
+            results_row = pd.DataFrame.from_dict(
+                input_df[strategy][idx]["results"][key], orient="index"
+            ).reset_index(drop=True)
+            results_row = results_row[RESULT_FIELDS]
+            complete_new_row = pd.concat(
+                [new_input_row, results_row], ignore_index=True, axis=1
+            )
+            parsed_df = pd.concat(
+                [parsed_df, complete_new_row], ignore_index=True, axis=0
+            )
+
+    parsed_df.columns = INPUT_COLUMNS + RESULT_COLUMNS
+    params = STRATEGY_PARAMS[strategy]
+    parsed_df[params] = parsed_df["inputs"].str.split("\n, ", expand=True)
+    for p in params:
+        parsed_df[p] = parsed_df[p].str.extract(r"(\d+\.\d+)")
+        parsed_df[p] = parsed_df[p].astype("float64")
+    parsed_df["start_date"] = pd.to_datetime(parsed_df["start_date"], format="%Y-%m-%d")
+    parsed_df["end_date"] = pd.to_datetime(parsed_df["end_date"], format="%Y-%m-%d")
+    parsed_df["strategy"] = strategy
+    parsed_df.drop(
+        ["inputs", "cash", "commission", "population_size", "generations"],
+        axis=1,
+        inplace=True,
+    )
+    return parsed_df
+
+
+def process(data: pd.DataFrame, parse) -> pd.DataFrame:
+    return pd.concat([parse(data, strategy) for strategy in STRATEGY_PARAMS])
+
+
+def flatten(data: pd.DataFrame, strategy: str) -> pd.DataFrame:
+    return flatten_runs(
+        iter_strategy_runs(data, strategy), strategy, STRATEGY_PARAMS[strategy]
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--results-per-strategy", type=int, default=5)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=1000,
+        help="largest run count to also time the row-by-row implementation on",
+    )
+    args = parser.parse_args()
+
+    for num_runs in args.runs:
+        data = pd.DataFrame(generate_runs(num_runs, args.results_per_strategy))
+
+        new_df, new_time = timed(process, data, flatten)
+        line = f"{num_runs:>7} runs  {len(new_df):>8} rows  flatten: {new_time:8.3f}s"
+
+        if num_runs <= args.legacy_max:
+            old_df, old_time = timed(process, data, legacy_parse_data)
+            same_schema = list(old_df.columns) == list(new_df.columns) and all(
+                old_df.dtypes == new_df.dtypes
+            )
+            line += (
+                f"  legacy: {old_time:8.3f}s ({len(old_df)} rows)"
+                f"  speedup: {old_time / new_time:6.1f}x"
+                f"  same columns/dtypes: {same_schema}"
+            )
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+Benchmarks the application end to end against a local database and the stub
+optimizer, and saves the timings as JSON so runs of different commits can be
+compared.
+
+Scenarios:
+* update: storing Results documents and full and incremental updates of
+processed_results (and with a mongod, full updates by aggregation pipeline)
+* graph: every /graph plot type as JSON and typed arrays, with an empty and a
+warm figure cache
+* optimize_get: the run history, a run, one strategy of a run and the
+leaderboard
+* optimize_post: submitting an optimization, until it is done, and submitting
+the same inputs again
+* cold_start: a fresh interpreter until the first page, /analyze and /graph
+
+The database is emptied and filled with synthetic runs first. The mongomock
+backend needs mongomock; the mongod backend needs a local mongod (never point
+it at a database you want to keep).
+
+Usage: python -m benchmarks.bench_scenarios [--backend mongomock|mongod]
+    [--uri mongodb://127.0.0.1:27017] [--runs 1000] [--repeat 5]
+    [--scenarios update graph ...] [--output results.json]
+    [--compare previous.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.backend import BACKENDS, load_runs, reset, use_backend
+from benchmarks.synthetic import FIRST_RUN, iter_runs
+from database.schema import STRATEGY_PARAMS
+
+SCENARIOS = ["update", "graph", "optimize_get", "optimize_post", "cold_start"]
+
+PLOT_TYPES = ["ParamReturn", "DrawdownReturn", "Features", "TradesReturn"]
+
+# where results are saved unless --output is given
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# seconds to wait for an optimization job against the stub
+JOB_TIMEOUT = 60
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def summarize(times: list[float]) -> dict:
+    ordered = sorted(times)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max": ordered[-1],
+    }
+
+
+def get_ok(client, url: str, **kwargs):
+    response = client.get(url, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"GET {url} answered {response.status_code}")
+    return response
+
+
+def setup(db, args, results: dict):
+    # every scenario needs the runs and their processed results
+    from database.database_controller import ResultsProcessing
+
+    reset(db)
+    runs = iter_runs(args.runs, args.results_per_strategy)
+    results["update/store_results"] = [timed(load_runs, runs)]
+    results["update/first"] = [timed(ResultsProcessing().update_processed_results)]
+
+
+def bench_update(args, results: dict):
+    from database.database_controller import ResultsProcessing
+
+    results_processing = ResultsProcessing()
+    results["update/full"] = [
+        timed(results_processing.update_processed_results, incremental=False)
+        for _ in range(args.repeat)
+    ]
+
+    if args.backend == "mongod":
+        # the aggregation pipeline modes need a real server
+        for mode in ["pipeline", "merge"]:
+            results[f"update/full_{mode}"] = [
+                timed(
+                    results_processing.update_processed_results,
+                    incremental=False,
+                    mode=mode,
+                )
+                for _ in range(args.repeat)
+            ]
+
+    # each repetition adds new runs after the existing ones
+    new_runs = max(1, args.runs // 20)
+    times = []
+    for i in range(args.repeat):
+        first = FIRST_RUN + timedelta(seconds=args.runs + i * new_runs)
+        load_runs(iter_runs(new_runs, args.results_per_strategy, seed=i + 1, first=first))
+        times.append(timed(results_processing.update_processed_results, incremental=True))
+    results[f"update/incremental_{new_runs}_runs"] = times
+
+
+def bench_graph(args, results: dict):
+    import application
+
+    client = application.application.test_client()
+    ticker = application.tsva.get().store.tickers()[0]
+
+    for plot_type in PLOT_TYPES:
+        for data_format in ["json", "binary"]:
+            url = (
+                f"/graph?type={plot_type}&ticker={ticker}&strategy=Breakout"
+                f"&format={data_format}"
+            )
+            # fits the feature importances and warms the rollups once
+            get_ok(client, url)
+
+            cold = []
+            for _ in range(args.repeat):
+                application.figure_cache.clear()
+                cold.append(timed(get_ok, client, url))
+            warm = [timed(get_ok, client, url) for _ in range(args.repeat)]
+            results[f"graph/{plot_type}/{data_format}/cold"] = cold
+            results[f"graph/{plot_type}/{data_format}/cached"] = warm
+
+
+def bench_optimize_get(args, results: dict):
+    import application
+
+    client = application.application.test_client()
+    newest = get_ok(client, "/optimize?summary=1&limit=1").get_json()[0]["_id"]
+    ticker = application.tsva.get().store.tickers()[0]
+
+    urls = {
+        "summaries": "/optimize?summary=1&limit=10",
+        "runs": "/optimize?limit=10",
+        "run": f"/optimize/{newest}",
+        "strategy": f"/optimize/{newest}/Breakout",
+        "leaderboard": f"/leaderboard?ticker={ticker}",
+        "leaderboard_strategy": f"/leaderboard?ticker={ticker}&strategy=Breakout",
+    }
+    for name, url in urls.items():
+        results[f"optimize_get/{name}"] = [
+            timed(get_ok, client, url) for _ in range(args.repeat)
+        ]
+
+
+def bench_optimize_post(args, results: dict):
+    import application
+
+    client = application.application.test_client()
+    submit, complete, memoized = [], [], []
+
+    def post(inputs):
+        response = client.post("/optimize", json=inputs)
+        if response.status_code != 202:
+            raise RuntimeError(f"POST /optimize answered {response.status_code}")
+        return response.get_json()["job_id"]
+
+    def wait(job_id):
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while time.monotonic() < deadline:
+            status = get_ok(client, f"/jobs/{job_id}").get_json()["status"]
+            if status == "done":
+                return
+            if status == "failed":
+                raise RuntimeError(f"Optimization job {job_id} failed")
+            time.sleep(0.001)
+        raise RuntimeError(f"Optimization job {job_id} did not finish")
+
+    for i in range(args.repeat):
+        # new inputs every time, so nothing is reused
+        inputs = {
+            "ticker": "TQQQ",
+            "populationSize": 10,
+            "generations": 1000 + i,
+            "startDate": "2015-01-01",
+            "endDate": "2020-01-01",
+            "selectedAlgos": [True] * len(STRATEGY_PARAMS),
+        }
+        start = time.perf_counter()
+        job_id = post(inputs)
+        submit.append(time.perf_counter() - start)
+        wait(job_id)
+        complete.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        wait(post(inputs))
+        memoized.append(time.perf_counter() - start)
+
+    results["optimize_post/submit"] = submit
+    results["optimize_post/complete"] = complete
+    results["optimize_post/memoized"] = memoized
+
+
+def bench_cold_start(args, results: dict, optimizer_url: str):
+    times = {}
+    for _ in range(args.repeat):
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_scenarios",
+            "--child",
+            "--backend",
+            args.backend,
+            "--runs",
+            str(args.runs),
+            "--results-per-strategy",
+            str(args.results_per_strategy),
+        ]
+        if args.uri:
+            command += ["--uri", args.uri]
+        output = subprocess.run(
+            command,
+            check=True,
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, OPTIMIZER_URL=optimizer_url, TSA_WARM_UP="0"),
+        ).stdout
+        for name, seconds in json.loads(output.strip().splitlines()[-1]).items():
+            times.setdefault(f"cold_start/{name}", []).append(seconds)
+    results.update(times)
+
+
+def child(args):
+    # a fresh interpreter, timed from the application import on
+    db = use_backend(args.backend, args.uri)
+    if args.backend == "mongomock":
+        # an in-memory database starts empty in every process
+        from benchmarks.synthetic import generate_processed_results
+        from credentials import db_credentials
+
+        rows = generate_processed_results(args.runs, args.results_per_strategy)
+        db[db_credentials["collection2"]].insert_many(
+            rows.reset_index().to_dict("records")
+        )
+
+    start = time.perf_counter()
+    import application
+
+    timings = {"import": time.perf_counter() - start}
+    client = application.application.test_client()
+    get_ok(client, "/")
+    timings["index"] = time.perf_counter() - start
+    get_ok(client, "/analyze")
+    timings["analyze"] = time.perf_counter() - start
+    ticker = application.tsva.get().store.tickers()[0]
+    get_ok(client, f"/graph?type=DrawdownReturn&ticker={ticker}")
+    timings["graph"] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return revision + ("-dirty" if changes else "")
+
+
+def compare(previous: dict, current: dict, threshold: float):
+    print(f"\ncompared with {previous['meta']['revision']}, medians:")
+    for key in ["backend", "runs", "results_per_strategy"]:
+        if previous["meta"].get(key) != current["meta"][key]:
+            print(
+                f"note: {key} was {previous['meta'].get(key)},"
+                f" now {current['meta'][key]}"
+            )
+    print(f"{'benchmark':50} {'before':>10} {'after':>10} {'change':>8}")
+    for name, stats in current["scenarios"].items():
+        if name not in previous["scenarios"]:
+            continue
+        before = previous["scenarios"][name]["median"]
+        after = stats["median"]
+        change = after / before - 1 if before else 0.0
+        flag = "  slower" if change > threshold else ""
+        print(
+            f"{name:50} {before * 1000:8.1f}ms {after * 1000:8.1f}ms"
+            f" {change:+7.0%}{flag}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, default="mongomock")
+    parser.add_argument("--uri", help="address of the local mongod")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--results-per-strategy", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="JSON file of the results")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change of a median reported as slower",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    from benchmarks.stub_optimizer import serve_in_thread
+    from optimization import optimizer_client
+
+    os.environ["TSA_WARM_UP"] = "0"
+    # the stub's request log would interleave with the results
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    optimizer_url, stub = serve_in_thread()
+    optimizer_client.OPTIMIZER_URL = optimizer_url
+
+    db = use_backend(args.backend, args.uri)
+    results = {}
+    setup(db, args, results)
+
+    for scenario in args.scenarios:
+        print(f"running {scenario}", file=sys.stderr)
+        if scenario == "update":
+            bench_update(args, results)
+        elif scenario == "graph":
+            bench_graph(args, results)
+        elif scenario == "optimize_get":
+            bench_optimize_get(args, results)
+        elif scenario == "optimize_post":
+            bench_optimize_post(args, results)
+        elif scenario == "cold_start":
+            bench_cold_start(args, results, optimizer_url)
+    stub.shutdown()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "runs": args.runs,
+            "results_per_strategy": args.results_per_strategy,
+            "repeat": args.repeat,
+        },
+        "scenarios": {name: summarize(times) for name, times in results.items()},
+    }
+
+    print(f"{'benchmark':50} {'median':>10} {'p95':>10}")
+    for name, stats in report["scenarios"].items():
+        print(f"{name:50} {stats['median'] * 1000:8.1f}ms {stats['p95'] * 1000:8.1f}ms")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['meta']['revision']}-{args.backend}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmarks application startup: the time until it can serve requests and the
+heavy modules it has imported by then, with processed results loaded eagerly at
+import (the previous behavior) and lazily.
+
+Every measurement runs in a fresh interpreter against an in-memory mongomock
+database filled with synthetic processed results (needs mongomock).
+
+Usage: python -m benchmarks.bench_startup [--runs 2000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["plotly", "sklearn"]
+
+
+def child(mode: str, runs: int):
+    from benchmarks.backend import use_mongomock
+    from benchmarks.synthetic import generate_processed_results
+    from credentials import db_credentials
+
+    db = use_mongomock()
+    rows = generate_processed_results(runs).reset_index().to_dict("records")
+    db[db_credentials["collection2"]].insert_many(rows)
+    os.environ["TSA_WARM_UP"] = "0"
+
+    start = time.perf_counter()
+    import application
+
+    imported = time.perf_counter() - start
+    if mode == "eager":
+        # what importing the application used to do
+        application.tsva.get()
+    serving = time.perf_counter() - start
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    # the first request that needs the data
+    application.application.test_client().get("/analyze")
+    analyzed = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "import": imported,
+                "serving": serving,
+                "analyze": analyzed,
+                "heavy": heavy,
+                "rows": len(rows),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.runs)
+        return
+
+    print(
+        f"{'mode':6} {'import':>8} {'serving':>8} {'first /analyze':>15}  heavy modules"
+    )
+    for mode in ["eager", "lazy"]:
+        results = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_startup",
+                    "--child",
+                    mode,
+                    "--runs",
+                    str(args.runs),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        def best(name):
+            return min(result[name] for result in results)
+
+        print(
+            f"{mode:6} {best('import'):7.2f}s {best('serving'):7.2f}s"
+            f" {best('analyze'):14.2f}s  {', '.join(results[0]['heavy']) or '-'}"
+        )
+    print(f"{results[0]['rows']} processed results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Local stand-in for the optimizer microservice, answering with synthetic results
+after a configurable delay.
+
+Usage: python -m benchmarks.stub_optimizer [--port 5001] [--delay 5]
+Then start the app with OPTIMIZER_URL=http://127.0.0.1:5001
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+from benchmarks.synthetic import make_run
+from database.schema import STRATEGY_PARAMS
+from optimization.optimizer_client import DATE_FORMAT
+
+
+def create_app(delay: float = 0.0) -> Flask:
+    app = Flask(__name__)
+    rng = random.Random(0)
+
+    @app.route("/algo_list", methods=["GET"])
+    def algo_list():
+        return jsonify(list(STRATEGY_PARAMS))
+
+    @app.route("/optimize", methods=["POST"])
+    def optimize():
+        data = request.get_json()
+        time.sleep(delay)
+
+        selected = data.get("selected_algos") or [True] * len(STRATEGY_PARAMS)
+        strategies = [s for s, on in zip(STRATEGY_PARAMS, selected) if on]
+        population_size = int(data.get("population_size", 10))
+
+        run = make_run(
+            rng,
+            # whole seconds, like the optimizer's timestamps
+            datetime.utcnow().replace(microsecond=0),
+            results_per_strategy=max(1, min(population_size, 50)),
+            strategies=strategies,
+        )
+        del run["_id"]
+        run["inputs"].update(
+            {
+                "_id": run["inputs"]["_id"].strftime(DATE_FORMAT),
+                "ticker": data["ticker"],
+                "population_size": data["population_size"],
+                "generations": data["generations"],
+                "start_date": data["start_date"],
+                "end_date": data["end_date"],
+            }
+        )
+        return jsonify(run)
+
+    return app
+
+
+def serve_in_thread(delay: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+    """
+    Serves the stub from a background thread, on a free port by default, and
+    returns its URL and server. Call server.shutdown() to stop it.
+    """
+    server = make_server(host, port, create_app(delay), threaded=True)
+    threading.Thread(target=server.serve_forever, name="stub-optimizer", daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--delay", type=float, default=5.0, help="seconds per optimization")
+    args = parser.parse_args()
+
+    create_app(args.delay).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import random
+from datetime import datetime, timedelta
+
+from database.schema import STRATEGY_PARAMS
+
+
+TICKERS = ["TQQQ", "TNA", "FNGU", "QQQ", "SPY", "SOXL", "UPRO", "IWM"]
+
+
+def make_result(rng: random.Random, params: list[str], buy_hold: float) -> dict:
+    """
+    Creates one backtest result in the shape returned by the optimizer.
+    """
+    param_string = "\n, ".join(
+        f"{p}: {rng.uniform(1, 200):.4f}" for p in params
+    )
+    p_return = rng.uniform(-80, 600)
+
+    return {
+        "inputs": param_string,
+        "# Trades": rng.randint(0, 400),
+        "Equity Final ($)": 10000 * (1 + p_return / 100),
+        "Return (%)": p_return,
+        "Max Drawdown (%)": -rng.uniform(1, 90),
+        "Avg Drawdown (%)": -rng.uniform(0.5, 20),
+        "Win Rate (%)": rng.uniform(0, 100),
+        "Sharpe Ratio": rng.uniform(-1, 3),
+        "Exposure Time (%)": rng.uniform(0, 100),
+        "Volatility (%)": rng.uniform(5, 120),
+        "Buy & Hold Return (%)": buy_hold,
+    }
+
+
+def make_run(
+    rng: random.Random,
+    timestamp: datetime,
+    results_per_strategy: int = 5,
+    strategies: list[str] = None,
+) -> dict:
+    """
+    Creates one document of the Results collection.
+    """
+    if strategies is None:
+        strategies = list(STRATEGY_PARAMS)
+
+    start = datetime(2011, 1, 1) + timedelta(days=rng.randint(0, 2000))
+    end = start + timedelta(days=rng.randint(200, 2500))
+    end = min(end, datetime(2023, 6, 1))
+    buy_hold = rng.uniform(-50, 900)
+
+    document = {
+        "_id": timestamp,
+        "inputs": {
+            "_id": timestamp,
+            "ticker": rng.choice(TICKERS),
+            "population_size": rng.randint(1, 1000),
+            "generations": rng.randint(1, 1000),
+            "cash": 10000,
+            "commission": 0.002,
+            "start_date": start.strftime("%Y-%m-%d"),
+            "end_date": end.strftime("%Y-%m-%d"),
+        },
+    }
+
+    for strategy in strategies:
+        params = STRATEGY_PARAMS[strategy]
+        document[strategy] = {
+            "description": f"{strategy} strategy. " + ", ".join(params),
+            "results": {
+                str(i): {"0": make_result(rng, params, buy_hold)}
+                for i in range(results_per_strategy)
+            },
+        }
+
+    return document
+
+
+# timestamp of the first synthetic run, later runs are a second apart
+FIRST_RUN = datetime(2023, 6, 1)
+
+
+def iter_runs(
+    num_runs: int,
+    results_per_strategy: int = 5,
+    seed: int = 0,
+    first: datetime = FIRST_RUN,
+):
+    """
+    Yields num_runs synthetic Results documents one at a time, so large
+    databases can be filled without holding every document. Roughly one in five
+    runs only optimizes a subset of the strategies, like runs submitted with
+    some algorithms unchecked.
+    """
+    rng = random.Random(seed)
+
+    for i in range(num_runs):
+        strategies = list(STRATEGY_PARAMS)
+        if rng.random() < 0.2:
+            strategies = rng.sample(strategies, rng.randint(1, 3))
+        yield make_run(
+            rng,
+            first + timedelta(seconds=i),
+            results_per_strategy=results_per_strategy,
+            strategies=strategies,
+        )
+
+
+def generate_runs(
+    num_runs: int,
+    results_per_strategy: int = 5,
+    seed: int = 0,
+    first: datetime = FIRST_RUN,
+) -> list[dict]:
+    """
+    Generates num_runs synthetic Results documents, see iter_runs.
+    """
+    return list(iter_runs(num_runs, results_per_strategy, seed, first))
+
+
+def generate_processed_results(num_runs: int, results_per_strategy: int = 5, seed: int = 0):
+    """
+    Generates the processed_results rows of num_runs synthetic runs, in the
+    shape ResultsProcessing.get_processed_results returns.
+    """
+    import pandas as pd
+    from database.flatten import flatten_runs, iter_strategy_runs
+
+    data = pd.DataFrame(generate_runs(num_runs, results_per_strategy, seed))
+    return pd.concat(
+        [
+            flatten_runs(iter_strategy_runs(data, strategy), strategy, params)
+            for strategy, params in STRATEGY_PARAMS.items()
+        ]
+    )
+
+
+def generate_ohlcv(
+    num_days: int = 3100, start_date: str = "2011-01-03", seed: int = 0
+):
+    """
+    Generates daily OHLCV bars following a geometric random walk, in the CSV
+    layout the local backtest engine loads (Date, Open, High, Low, Close, Volume).
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=num_days)
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, num_days)))
+    open_ = close * np.exp(rng.normal(0, 0.005, num_days))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, num_days)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, num_days)))
+
+    return pd.DataFrame(
+        {
+            "Date": dates,
+            "Open": open_,
+            "High": high,
+            "Low": low,
+            "Close": close,
+            "Volume": rng.integers(1e5, 1e7, num_days),
+        }
+    )
@@ -4,4 +4,17 @@ db_credentials = {
     "database": "trading-strategy-analysis",
     "collection": "Results",
     "collection2": "processed_results",
-}
\ No newline at end of file
+    "collection3": "processing_state",
+    "collection4": "optimization_jobs",
+    "collection5": "run_summaries",
+}
+# Options passed to the shared MongoClient (see database/connection.py).
+db_client_options = {
+    "maxPoolSize": 50,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 300000,
+    "connectTimeoutMS": 10000,
+    "serverSelectionTimeoutMS": 10000,
+    "socketTimeoutMS": 300000,
+    "readPreference": "primaryPreferred",
+}
@@ -0,0 +1,63 @@
+"""
+asyncio versions of the database_controller calls made while an optimization
+job waits on the optimizer, for AsyncOptimizationJobs.
+
+They use motor when it is installed. Otherwise, or when the shared client was
+given to connection.set_client (e.g. mongomock in benchmarks), the blocking
+database_controller calls run in threads.
+"""
+import asyncio
+from datetime import datetime
+
+import database.database_controller as db
+from credentials import db_credentials
+from database.connection import get_async_client
+from database.schema import upgrade_document
+from database.summaries import run_summaries
+from instrumentation.metrics import DB_OPERATION_SECONDS
+
+# motor client of each event loop, None where the blocking calls are used
+_clients = {}
+
+
+def get_async_db():
+    """
+    Returns the motor database of the running event loop, or None if the
+    blocking calls are used instead.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = get_async_client()
+    client = _clients[loop]
+    return None if client is None else client[db_credentials["database"]]
+
+
+async def add_results(document: dict, timestamp: datetime) -> datetime:
+    # same as database_controller.add_results
+    database = get_async_db()
+    if database is None:
+        return await asyncio.to_thread(db.add_results, document, timestamp)
+
+    upgrade_document(document)
+
+    with DB_OPERATION_SECONDS.time(operation="add_results"):
+        for attempt in db.run_id_attempts(document, timestamp):
+            with attempt:
+                await database[db_credentials["collection"]].insert_one(document)
+        summaries = run_summaries(document)
+        if summaries:
+            await database[db_credentials["collection5"]].bulk_write(
+                db.summary_writes(summaries), ordered=False
+            )
+    return document["_id"]
+
+
+async def update_job(job_id: str, fields: dict):
+    # same as database_controller.update_job
+    database = get_async_db()
+    if database is None:
+        return await asyncio.to_thread(db.update_job, job_id, fields)
+
+    await database[db_credentials["collection4"]].update_one(
+        {"_id": job_id}, {"$set": fields}
+    )
@@ -0,0 +1,204 @@
+"""
+Streams the processed_results collection out as CSV, NDJSON or Parquet.
+
+Rows are read from a server-side cursor in batches and every batch is encoded
+and yielded on its own, so exports use constant memory however many rows match.
+
+Usage: python -m database.export --format csv --ticker TQQQ --strategy Breakout
+           --start-date 2011-01-01 --end-date 2023-06-01 -o tqqq.csv
+"""
+import argparse
+import io
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from credentials import db_credentials
+from database.connection import get_db
+from database.flatten import DROPPED_COLUMNS, INPUT_COLUMNS, RESULT_COLUMNS
+from database.schema import ALL_PARAMS
+
+
+# rows read from the server per round trip and encoded per chunk
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# every batch is written with the same columns, in this order
+EXPORT_COLUMNS = (
+    ["_id"]
+    + [c for c in INPUT_COLUMNS + RESULT_COLUMNS if c not in DROPPED_COLUMNS]
+    + ["strategy"]
+    + ALL_PARAMS
+)
+TEXT_COLUMNS = ["_id", "ticker", "strategy"]
+DATE_COLUMNS = ["start_date", "end_date"]
+
+
+def export_query(
+    ticker: str = None, strategy: str = None, start_date: str = None, end_date: str = None
+) -> dict:
+    """
+    Returns the filter of processed results of a ticker and strategy whose
+    backtest period lies between start_date and end_date (YYYY-MM-DD).
+
+    Raises ValueError if a date isn't in YYYY-MM-DD format.
+    """
+    query = {}
+    if ticker:
+        query["ticker"] = ticker
+    if strategy:
+        query["strategy"] = strategy
+    if start_date:
+        query["start_date"] = {"$gte": datetime.strptime(start_date, "%Y-%m-%d")}
+    if end_date:
+        query["end_date"] = {"$lte": datetime.strptime(end_date, "%Y-%m-%d")}
+    return query
+
+
+def iter_batches(collection, query: dict, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Yields DataFrames of up to batch_size matching rows with EXPORT_COLUMNS.
+    """
+    cursor = collection.find(query, batch_size=batch_size).sort("_id", 1)
+    rows = []
+
+    try:
+        for row in cursor:
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield _frame(rows)
+                rows = []
+        if rows:
+            yield _frame(rows)
+    finally:
+        cursor.close()
+
+
+def _frame(rows: list[dict]) -> pd.DataFrame:
+    frame = pd.DataFrame(rows).reindex(columns=EXPORT_COLUMNS)
+    for column in EXPORT_COLUMNS:
+        if column in TEXT_COLUMNS:
+            frame[column] = frame[column].astype(str)
+        elif column in DATE_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column])
+        else:
+            frame[column] = frame[column].astype("float64")
+    return frame
+
+
+def stream_export(
+    collection, export_format: str, query: dict, batch_size: int = EXPORT_BATCH_SIZE
+):
+    """
+    Yields the matching rows encoded in export_format, one chunk of bytes per
+    batch.
+    """
+    if export_format == "csv":
+        yield ",".join(EXPORT_COLUMNS).encode() + b"\n"
+        for batch in iter_batches(collection, query, batch_size):
+            yield batch.to_csv(index=False, header=False, date_format="%Y-%m-%d").encode()
+
+    elif export_format == "ndjson":
+        for batch in iter_batches(collection, query, batch_size):
+            yield batch.to_json(
+                orient="records", lines=True, date_format="iso"
+            ).encode().rstrip(b"\n") + b"\n"
+
+    elif export_format == "parquet":
+        yield from _stream_parquet(collection, query, batch_size)
+
+    else:
+        raise ValueError(f"Unknown export format {export_format}")
+
+
+class _ChunkSink(io.RawIOBase):
+    # write-only stream whose written bytes are taken out after every batch
+    def __init__(self) -> None:
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _stream_parquet(collection, query: dict, batch_size: int):
+    # every batch becomes a row group, the footer is written at the end
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            (
+                column,
+                pa.string()
+                if column in TEXT_COLUMNS
+                else pa.timestamp("ns")
+                if column in DATE_COLUMNS
+                else pa.float64(),
+            )
+            for column in EXPORT_COLUMNS
+        ]
+    )
+    sink = _ChunkSink()
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in iter_batches(collection, query, batch_size):
+            writer.write_table(
+                pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+            )
+            yield sink.take()
+    yield sink.take()
+
+
+def get_processed_collection():
+    return get_db()[db_credentials["collection2"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--ticker")
+    parser.add_argument("--strategy")
+    parser.add_argument("--start-date", help="YYYY-MM-DD")
+    parser.add_argument("--end-date", help="YYYY-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="file to write, defaults to stdout")
+    args = parser.parse_args()
+
+    try:
+        query = export_query(args.ticker, args.strategy, args.start_date, args.end_date)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream_export(
+            get_processed_collection(), args.format, query, args.batch_size
+        ):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
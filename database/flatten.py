@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+
+# names from database dictionary
+INPUT_FIELDS = [
+    "ticker",
+    "population_size",
+    "generations",
+    "cash",
+    "commission",
+    "start_date",
+    "end_date",
+]
+
+# names from database dictionary
+RESULT_FIELDS = [
+    "inputs",
+    "# Trades",
+    "Equity Final ($)",
+    "Return (%)",
+    "Max Drawdown (%)",
+    "Avg Drawdown (%)",
+    "Win Rate (%)",
+    "Sharpe Ratio",
+    "Exposure Time (%)",
+    "Volatility (%)",
+    "Buy & Hold Return (%)",
+]
+
+# column names to rename to for analysis, in the same order as the fields above
+INPUT_COLUMNS = [
+    "ticker",
+    "population_size",
+    "generations",
+    "cash",
+    "commission",
+    "start_date",
+    "end_date",
+]
+RESULT_COLUMNS = [
+    "inputs",
+    "num_trades",
+    "final_equity",
+    "p_return",
+    "p_max_drawdown",
+    "p_avg_drawdown",
+    "p_winrate",
+    "sharpe_ratio",
+    "p_exposure_time",
+    "p_volatility",
+    "p_buy_hold_return",
+]
+
+# number in one "NAME: value" part of a result's "inputs" display string, with
+# or without decimals
+PARAM_VALUE_PATTERN = r"(\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+
+# columns only needed while flattening
+DROPPED_COLUMNS = ["inputs", "cash", "commission", "population_size", "generations"]
+
+
+def row_id(run_id, strategy: str, index: str, sub_index: str) -> str:
+    """
+    Deterministic id of a processed result row, so processing the same run twice
+    overwrites its rows instead of duplicating them.
+    """
+    if hasattr(run_id, "isoformat"):
+        run_id = run_id.isoformat()
+    return f"{run_id}/{strategy}/{index}/{sub_index}"
+
+
+def iter_strategy_runs(data: pd.DataFrame, strategy: str):
+    """
+    Yields (run_id, inputs, strategy_document) for every run in a DataFrame of the
+    Results collection that contains results for the given strategy.
+    """
+    if strategy not in data.columns or "inputs" not in data.columns:
+        return
+
+    input_df = data[["_id", "inputs", strategy]].dropna()
+    yield from zip(input_df["_id"], input_df["inputs"], input_df[strategy])
+
+
+def flatten_runs(runs, strategy: str, params: list[str]) -> pd.DataFrame:
+    """
+    Flattens nested optimization runs into one row per backtest result.
+
+    Every field is gathered into its own column list in a single pass over the
+    runs and the DataFrame is built once at the end, instead of concatenating a
+    new DataFrame for every result. Rows are indexed by their row_id.
+
+    Parameters are read from each result's "params" document (schema version
+    2). Results stored before it existed have their "inputs" display string
+    parsed instead.
+
+    Parameters
+    runs: iterable of (object, dict, dict)
+        A run's _id, its "inputs" document and its strategy document (the one
+        holding "results")
+    strategy: str
+        Should be either 'Exp/Con', 'Acceleration', 'Breakout' or 'Velocity'
+    params: list[str]
+        Names of the optimized parameters of the strategy, the keys of each
+        result's numeric "params" document, in the order they appear in its
+        "inputs" string
+    """
+    columns = {name: [] for name in INPUT_COLUMNS + RESULT_COLUMNS}
+    input_columns = list(zip(INPUT_FIELDS, INPUT_COLUMNS))
+    result_columns = list(zip(RESULT_FIELDS, RESULT_COLUMNS))
+    param_values = {p: [] for p in params}
+
+    ids = []
+    # positions of results stored without numeric parameters
+    legacy = []
+
+    for run_id, run_inputs, strategy_doc in runs:
+        input_row = [run_inputs.get(field) for field in INPUT_FIELDS]
+
+        # each optimized run index may hold several backtest results
+        for index, backtests in strategy_doc["results"].items():
+            for sub_index, result in backtests.items():
+                ids.append(row_id(run_id, strategy, index, sub_index))
+                for value, (_, column) in zip(input_row, input_columns):
+                    columns[column].append(value)
+                for field, column in result_columns:
+                    columns[column].append(result.get(field))
+
+                result_params = result.get("params")
+                if result_params is None:
+                    legacy.append(len(ids) - 1)
+                    result_params = {}
+                for p, values in param_values.items():
+                    value = result_params.get(p)
+                    values.append(np.nan if value is None else value)
+
+    index = pd.Index(ids, name="_id", dtype=object)
+    parsed_df = pd.DataFrame(columns, index=index)
+
+    # numeric parameters are read as they are, only the results written before
+    # they were stored need their display strings parsed
+    param_df = pd.DataFrame(
+        {p: np.array(values, dtype=np.float64) for p, values in param_values.items()},
+        index=index,
+    )
+    if legacy:
+        param_df.iloc[legacy] = parse_param_strings(
+            parsed_df["inputs"].iloc[legacy], params
+        ).to_numpy()
+    parsed_df = pd.concat([parsed_df, param_df], axis=1)
+
+    # to datetime
+    parsed_df["start_date"] = pd.to_datetime(
+        parsed_df["start_date"], format="%Y-%m-%d"
+    )
+    parsed_df["end_date"] = pd.to_datetime(
+        parsed_df["end_date"], format="%Y-%m-%d"
+    )
+
+    # add strategy_name
+    parsed_df["strategy"] = strategy
+
+    parsed_df.drop(DROPPED_COLUMNS, axis=1, inplace=True)
+
+    return parsed_df
+
+
+def parse_param_strings(inputs: pd.Series, params: list[str]) -> pd.DataFrame:
+    """
+    Parses the display strings of optimized parameters (e.g. "SW: 10.0\\n, LW: 50")
+    into one float64 column per parameter.
+    """
+    if len(inputs) == 0:
+        return pd.DataFrame(
+            {p: pd.Series(dtype="float64") for p in params}, index=inputs.index
+        )
+
+    split = inputs.str.split("\n, ", n=len(params) - 1, expand=True)
+    split = split.reindex(columns=range(len(params)))
+
+    parsed = pd.DataFrame(index=inputs.index)
+    for column, p in enumerate(params):
+        values = split[column]
+        if values.isna().all():
+            parsed[p] = np.nan
+        else:
+            parsed[p] = values.str.extract(PARAM_VALUE_PATTERN, expand=False)
+        parsed[p] = parsed[p].astype("float64")
+
+    return parsed
@@ -0,0 +1,34 @@
+"""
+Rewrites the Results documents stored in an older schema version in the current
+one (see database.schema), in bulk batches.
+
+Usage: python -m database.migrate [--batch-size 1000] [--reprocess]
+"""
+import argparse
+
+import database.database_controller as db
+from database.schema import SCHEMA_VERSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=db.WRITE_BATCH_SIZE)
+    parser.add_argument(
+        "--reprocess",
+        action="store_true",
+        help="rebuild processed_results from the migrated documents afterwards",
+    )
+    args = parser.parse_args()
+
+    count = db.migrate_results(args.batch_size)
+    print(f"{count} Results documents migrated to schema version {SCHEMA_VERSION}")
+
+    if args.reprocess:
+        # parameters the display strings lost (e.g. integers) are only fixed by
+        # a full update, incremental ones skip runs already processed
+        db.ResultsProcessing().update_processed_results(incremental=False)
+        print("processed_results rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Flattens Results documents inside MongoDB with an aggregation pipeline, so only
+the processed_results columns leave the server instead of whole documents.
+
+The pipeline produces the same rows as database.flatten: one per backtest
+result, keyed by the same row id. It needs MongoDB 4.2 or newer ($regexFind,
+$merge), so it can't run against mongomock; compare it with the Python
+flattening on a local mongod with:
+
+    python -m database.pipeline --uri mongodb://127.0.0.1:27017 --check
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from database.flatten import (
+    DROPPED_COLUMNS,
+    INPUT_COLUMNS,
+    PARAM_VALUE_PATTERN,
+    RESULT_COLUMNS,
+    RESULT_FIELDS,
+)
+
+# documents per batch of the aggregation cursor
+PIPELINE_BATCH_SIZE = 1000
+
+# columns of a processed result row, besides the strategy's parameters
+ROW_COLUMNS = [c for c in INPUT_COLUMNS + RESULT_COLUMNS if c not in DROPPED_COLUMNS]
+
+
+def flatten_pipeline(strategy: str, params: list[str], query: dict = None) -> list:
+    """
+    Returns the aggregation stages flattening the results of one strategy in
+    the Results documents matching query into processed_results rows.
+
+    Parameters
+    strategy: str
+        Should be either 'Exp/Con', 'Acceleration', 'Breakout' or 'Velocity'
+    params: list[str]
+        Names of the optimized parameters of the strategy, see flatten_runs
+    query: dict
+        Filter of the Results documents, e.g. a range of run _ids
+    """
+    result = "$backtests.v"
+
+    row = {
+        "_id": {
+            "$concat": [
+                _run_id_string("$run_id"),
+                "/",
+                {"$literal": strategy},
+                "/",
+                "$index",
+                "/",
+                "$backtests.k",
+            ]
+        },
+        "ticker": 1,
+        "start_date": {"$dateFromString": {"dateString": "$start_date", "format": "%Y-%m-%d"}},
+        "end_date": {"$dateFromString": {"dateString": "$end_date", "format": "%Y-%m-%d"}},
+    }
+    for field, column in zip(RESULT_FIELDS, RESULT_COLUMNS):
+        if column not in DROPPED_COLUMNS:
+            row[column] = f"{result}.{field}"
+    for position, name in enumerate(params):
+        row[name] = _param(result, name, position)
+    row["strategy"] = {"$literal": strategy}
+
+    return [
+        {
+            "$match": {
+                **(query or {}),
+                f"{strategy}.results": {"$type": "object"},
+                "inputs": {"$type": "object"},
+            }
+        },
+        # run fields, and each optimized run index with its backtests
+        {
+            "$project": {
+                "_id": 0,
+                "run_id": "$_id",
+                "ticker": "$inputs.ticker",
+                "start_date": "$inputs.start_date",
+                "end_date": "$inputs.end_date",
+                "indexes": {"$objectToArray": f"${strategy}.results"},
+            }
+        },
+        {"$unwind": "$indexes"},
+        {
+            "$project": {
+                "run_id": 1,
+                "ticker": 1,
+                "start_date": 1,
+                "end_date": 1,
+                "index": "$indexes.k",
+                "backtests": {"$objectToArray": "$indexes.v"},
+            }
+        },
+        {"$unwind": "$backtests"},
+        {"$project": row},
+    ]
+
+
+def _run_id_string(run_id: str) -> dict:
+    # the run's _id as row_id writes it: datetime.isoformat for dates, which
+    # only shows fractions of a second when there are any
+    seconds = {"$dateToString": {"date": run_id, "format": "%Y-%m-%dT%H:%M:%S"}}
+    milliseconds = {
+        "$concat": [
+            {"$dateToString": {"date": run_id, "format": "%Y-%m-%dT%H:%M:%S.%L"}},
+            "000",
+        ]
+    }
+    return {
+        "$switch": {
+            "branches": [
+                {
+                    "case": {"$ne": [{"$type": run_id}, "date"]},
+                    "then": {"$toString": run_id},
+                },
+                {"case": {"$eq": [{"$millisecond": run_id}, 0]}, "then": seconds},
+            ],
+            "default": milliseconds,
+        }
+    }
+
+
+def _param(result: str, name: str, position: int) -> dict:
+    # the numeric parameter, or for results stored without numeric parameters
+    # the first number in its part of the "inputs" display string
+    part = {
+        "$arrayElemAt": [{"$split": [f"{result}.inputs", "\n, "]}, position]
+    }
+    parsed = {
+        "$cond": [
+            {"$eq": [{"$type": f"{result}.inputs"}, "string"]},
+            {
+                "$let": {
+                    "vars": {
+                        "found": {"$regexFind": {"input": part, "regex": PARAM_VALUE_PATTERN}}
+                    },
+                    "in": {"$toDouble": "$$found.match"},
+                }
+            },
+            None,
+        ]
+    }
+    return {
+        "$cond": [
+            {"$in": [{"$type": f"{result}.params"}, ["missing", "null"]]},
+            parsed,
+            f"{result}.params.{name}",
+        ]
+    }
+
+
+def read_flattened(
+    collection,
+    strategy: str,
+    params: list[str],
+    query: dict = None,
+    batch_size: int = PIPELINE_BATCH_SIZE,
+) -> pd.DataFrame:
+    """
+    Runs flatten_pipeline and returns its rows in the shape of flatten_runs.
+
+    Rows are read through a cursor in batches and gathered column by column,
+    so memory grows with the output columns rather than the Results documents.
+
+    Parameters
+    collection: pymongo.collection.Collection
+        The Results collection
+    """
+    columns = ROW_COLUMNS + list(params) + ["strategy"]
+    values = {column: [] for column in columns}
+    ids = []
+
+    cursor = collection.aggregate(
+        flatten_pipeline(strategy, params, query),
+        batchSize=batch_size,
+        allowDiskUse=True,
+    )
+    for row in cursor:
+        ids.append(row["_id"])
+        for column, column_values in values.items():
+            column_values.append(row.get(column))
+
+    for name in params:
+        values[name] = np.array(values[name], dtype=np.float64)
+
+    rows = pd.DataFrame(values, index=pd.Index(ids, name="_id", dtype=object))
+    rows["start_date"] = pd.to_datetime(rows["start_date"])
+    rows["end_date"] = pd.to_datetime(rows["end_date"])
+    return rows
+
+
+def merge_flattened(
+    collection, into: str, strategy: str, params: list[str], query: dict = None
+):
+    """
+    Runs flatten_pipeline and upserts its rows into the into collection on the
+    server ($merge), without sending them to this process.
+    """
+    pipeline = flatten_pipeline(strategy, params, query) + [
+        {
+            "$merge": {
+                "into": into,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        }
+    ]
+    collection.aggregate(pipeline, allowDiskUse=True)
+
+
+def flattened_ids(
+    collection,
+    strategy: str,
+    params: list[str],
+    query: dict = None,
+    batch_size: int = PIPELINE_BATCH_SIZE,
+) -> list:
+    # row ids flatten_pipeline produces, e.g. to find stale processed rows
+    pipeline = flatten_pipeline(strategy, params, query)
+    pipeline[-1] = {"$project": {"_id": pipeline[-1]["$project"]["_id"]}}
+    cursor = collection.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True)
+    return [row["_id"] for row in cursor]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", help="MongoDB address, e.g. of a local mongod")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the pipeline's rows with the Python flattening",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="rebuild processed_results with $merge on the server",
+    )
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+
+        from database.connection import set_client
+
+        set_client(MongoClient(args.uri))
+
+    import database.database_controller as db
+
+    if args.check:
+        results_processing = db.ResultsProcessing()
+        expected = results_processing.process_results(mode="python")
+        actual = results_processing.process_results(mode="pipeline")
+        pd.testing.assert_frame_equal(
+            actual.sort_index(), expected.sort_index(), check_dtype=False
+        )
+        print(f"{len(actual)} rows match the Python flattening")
+
+    if args.merge:
+        db.ResultsProcessing().update_processed_results(incremental=False, mode="merge")
+        print("processed_results rebuilt on the server")
+
+
+if __name__ == "__main__":
+    main()
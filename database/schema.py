@@ -0,0 +1,114 @@
+import math
+import re
+
+from database.flatten import PARAM_VALUE_PATTERN, RESULT_FIELDS
+
+
+# version of the Results document layout written by add_results
+#   1: parameters only in each result's "inputs" display string
+#   2: also a numeric "params" sub-document per result, numeric metrics
+SCHEMA_VERSION = 2
+
+# optimized parameters of each strategy, in the order they appear in the
+# "inputs" display string of a backtest result
+STRATEGY_PARAMS = {
+    "Breakout": ["WL", "CSL", "DSL", "ATRP", "ATRM", "DB"],
+    "Acceleration": ["SW", "LW"],
+    "Velocity": ["SW", "LW", "RSI", "TSL"],
+    "Exp/Con": ["SW", "LW", "CSL", "ATRM"],
+}
+
+# every optimized parameter, in the column order of processed results exports
+# and plot hover data
+ALL_PARAMS = ["SW", "LW", "WL", "CSL", "DSL", "ATRP", "ATRM", "DB", "RSI", "TSL"]
+
+# numeric fields of a backtest result
+METRIC_FIELDS = [field for field in RESULT_FIELDS if field != "inputs"]
+
+_param_value = re.compile(PARAM_VALUE_PATTERN)
+
+
+def parse_params(inputs: str, params: list[str]) -> dict:
+    """
+    Parses the display string of a result's optimized parameters (e.g.
+    "SW: 10.0\\n, LW: 50") into {name: float}, the same way processing parses
+    it. Parameters without a value are NaN.
+    """
+    parts = inputs.split("\n, ", len(params) - 1) if isinstance(inputs, str) else []
+    values = {}
+    for position, name in enumerate(params):
+        match = _param_value.search(parts[position]) if position < len(parts) else None
+        values[name] = float(match.group(1)) if match else math.nan
+    return values
+
+
+def to_number(value):
+    """
+    Returns value as an int or float, or None if it isn't a number. Numbers
+    sent as strings (e.g. "12.5" or "NaN") are converted.
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if hasattr(value, "item"):
+        # NumPy scalars
+        return value.item()
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def upgrade_result(result: dict, params: list[str]) -> dict:
+    # adds the numeric parameters and converts the metrics of one result
+    if "params" not in result:
+        result["params"] = parse_params(result.get("inputs"), params)
+    for field in METRIC_FIELDS:
+        if field in result:
+            result[field] = to_number(result[field])
+    return result
+
+
+def document_version(document: dict) -> int:
+    """
+    Returns the schema version of a Results document, kept in its "inputs" so
+    the pages showing every top-level key as a strategy don't see it.
+    """
+    inputs = document.get("inputs")
+    if not isinstance(inputs, dict):
+        return 1
+    return inputs.get("schema_version", 1)
+
+
+def upgrade_document(document: dict) -> dict:
+    """
+    Converts a Results document to SCHEMA_VERSION in place and returns it.
+
+    Every result of a known strategy gets a "params" sub-document of its
+    optimized parameters as floats, keyed by the names in STRATEGY_PARAMS, and
+    its metrics are stored as numbers. The "inputs" display string is kept for
+    the pages that show it. Documents already at SCHEMA_VERSION are returned
+    unchanged.
+    """
+    # a top-level version, written before it moved to "inputs"
+    version = document.pop("schema_version", None)
+    if isinstance(document.get("inputs"), dict) and version is not None:
+        document["inputs"].setdefault("schema_version", version)
+
+    if document_version(document) >= SCHEMA_VERSION:
+        return document
+
+    for strategy, params in STRATEGY_PARAMS.items():
+        strategy_doc = document.get(strategy)
+        if not isinstance(strategy_doc, dict):
+            continue
+        for backtests in strategy_doc.get("results", {}).values():
+            for result in backtests.values():
+                upgrade_result(result, params)
+
+    if isinstance(document.get("inputs"), dict):
+        document["inputs"]["schema_version"] = SCHEMA_VERSION
+    return document
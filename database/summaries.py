@@ -0,0 +1,88 @@
+def summarize_strategy(strategy_doc: dict) -> dict:
+    """
+    Returns the compact summary of one strategy's results in a run: the best
+    return and Sharpe ratio, the Pareto front of return vs max drawdown and the
+    number of backtest results.
+
+    The Pareto front holds the results no other result beats on both return
+    and max drawdown (drawdowns are negative, so higher is better for both),
+    sorted by return, best first.
+    """
+    points = []
+    best_sharpe = None
+
+    for index, backtests in strategy_doc.get("results", {}).items():
+        for sub_index, result in backtests.items():
+            p_return = result.get("Return (%)")
+            drawdown = result.get("Max Drawdown (%)")
+            sharpe = result.get("Sharpe Ratio")
+
+            if _is_number(sharpe) and (best_sharpe is None or sharpe > best_sharpe):
+                best_sharpe = sharpe
+            if _is_number(p_return) and _is_number(drawdown):
+                points.append((p_return, drawdown, f"{index}/{sub_index}"))
+
+    # best return first, ties broken by the smaller drawdown
+    points.sort(key=lambda point: (-point[0], -point[1]))
+
+    pareto_front = []
+    for p_return, drawdown, result_id in points:
+        if not pareto_front or drawdown > pareto_front[-1]["max_drawdown"]:
+            pareto_front.append(
+                {"result": result_id, "return": p_return, "max_drawdown": drawdown}
+            )
+
+    return {
+        "best_return": points[0][0] if points else None,
+        "best_result": points[0][2] if points else None,
+        "best_sharpe": best_sharpe,
+        "pareto_front": pareto_front,
+        "num_results": sum(
+            len(backtests) for backtests in strategy_doc.get("results", {}).values()
+        ),
+    }
+
+
+def run_summaries(document: dict) -> list[dict]:
+    """
+    Returns one summary document per strategy of a Results document, keyed by
+    run and strategy so summarizing the same run twice replaces its summaries.
+    """
+    run_id = document["_id"]
+    inputs = document.get("inputs", {})
+    summaries = []
+
+    for strategy, strategy_doc in document.items():
+        if not isinstance(strategy_doc, dict) or "results" not in strategy_doc:
+            continue
+
+        summaries.append(
+            {
+                "_id": f"{run_id.isoformat()}/{strategy}",
+                "run_id": run_id,
+                "ticker": inputs.get("ticker"),
+                "start_date": inputs.get("start_date"),
+                "end_date": inputs.get("end_date"),
+                "strategy": strategy,
+                **summarize_strategy(strategy_doc),
+            }
+        )
+
+    return summaries
+
+
+def _is_number(value) -> bool:
+    # NaN results (e.g. the Sharpe ratio of a run without trades) never win
+    return isinstance(value, (int, float)) and value == value
+
+
+def main():
+    # python -m database.summaries summarizes the runs already in the database
+    import database.database_controller as db
+
+    db.create_indexes()
+    print(f"{db.backfill_summaries()} run summaries written")
+
+
+if __name__ == "__main__":
+    main()
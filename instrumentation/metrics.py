@@ -0,0 +1,240 @@
+"""
+Process-wide counters and latency histograms, rendered in the Prometheus text
+format by the /metrics endpoint.
+
+Set TSA_METRICS=0 to turn recording off; timers then only check a flag.
+"""
+import functools
+import os
+import threading
+import time
+
+
+ENABLED = os.environ.get("TSA_METRICS", "1") != "0"
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """
+        Registers a callable returning [(name, type, help, {labels: value})] of
+        values kept elsewhere, e.g. cache hit counters, read at render time.
+        """
+        with self._lock:
+            self.collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """
+    Monotonic count per combination of label values.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            lines.append(f"{self.name}{_labels(labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values per combination of label values, in
+    cumulative buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames=(),
+        buckets=LATENCY_BUCKETS,
+        registry=REGISTRY,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels) -> "Timer":
+        """
+        Returns a context manager and decorator observing the elapsed seconds.
+        """
+        return Timer(self, labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = {key: (list(b), n, s) for key, (b, n, s) in self._values.items()}
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, (bucket_counts, count, total) in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", _number(bound)),)
+                lines.append(f"{self.name}_bucket{_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+        return lines
+
+
+class Timer:
+    def __init__(self, histogram: Histogram, labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.histogram.observe(time.perf_counter() - start, **self.labels)
+
+        return timed
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# metrics of the instrumented paths, shared by the modules that record them
+HTTP_REQUEST_SECONDS = Histogram(
+    "tsa_http_request_seconds",
+    "Latency of HTTP requests by route",
+    ["route", "method", "status"],
+)
+HTTP_RESPONSE_BYTES = Counter(
+    "tsa_http_response_bytes_total",
+    "Bytes of HTTP response bodies with a known length, by route",
+    ["route"],
+)
+MONGO_CONNECT_SECONDS = Histogram(
+    "tsa_mongo_connect_seconds", "Time to create the shared MongoClient"
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "tsa_mongo_command_seconds",
+    "Latency of MongoDB commands by command name and outcome",
+    ["command", "outcome"],
+)
+DB_OPERATION_SECONDS = Histogram(
+    "tsa_db_operation_seconds",
+    "Latency of database_controller operations",
+    ["operation"],
+)
+OPTIMIZER_REQUEST_SECONDS = Histogram(
+    "tsa_optimizer_request_seconds",
+    "Latency of requests to the optimizer microservice",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS + (300, 900, 1800, 3600),
+)
+PARSE_SECONDS = Histogram(
+    "tsa_parse_data_seconds", "Time to flatten Results documents", ["strategy"]
+)
+PARSED_ROWS = Counter(
+    "tsa_parsed_rows_total", "Processed result rows flattened", ["strategy"]
+)
+FIGURE_BUILD_SECONDS = Histogram(
+    "tsa_figure_build_seconds",
+    "Time to build and serialize a figure",
+    ["plot"],
+)
+FIGURE_SERIALIZE_SECONDS = Histogram(
+    "tsa_figure_serialize_seconds", "Time to serialize a figure", ["format"]
+)
+FIGURE_BYTES = Counter(
+    "tsa_figure_bytes_total", "Bytes of serialized figures", ["format"]
+)
@@ -0,0 +1,23 @@
+from pymongo import monitoring
+
+from instrumentation.metrics import MONGO_COMMAND_SECONDS
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Records the latency of every command the MongoClient sends, e.g. find,
+    getMore, insert or aggregate, as reported by the driver.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6, command=event.command_name, outcome="ok"
+        )
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6, command=event.command_name, outcome="error"
+        )
@@ -0,0 +1,55 @@
+"""
+Opt-in sampling profiler for requests.
+
+Set TSA_PROFILE_DIR to a directory and TSA_PROFILE_SAMPLE to the fraction of
+requests to profile (default 0.01). Each sampled request is profiled with
+cProfile and written to <dir>/<time>-<route>.prof, which can be read with
+pstats or snakeviz. Only one request is profiled at a time; others are not
+sampled while it runs. Without TSA_PROFILE_DIR this costs a flag check.
+"""
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+
+PROFILE_DIR = os.environ.get("TSA_PROFILE_DIR")
+PROFILE_SAMPLE = float(os.environ.get("TSA_PROFILE_SAMPLE", "0.01"))
+ENABLED = bool(PROFILE_DIR) and PROFILE_SAMPLE > 0
+
+_active = threading.Lock()
+
+
+def start():
+    """
+    Returns a running profiler if this request is sampled, otherwise None.
+    """
+    if not ENABLED or random.random() >= PROFILE_SAMPLE:
+        return None
+    if not _active.acquire(blocking=False):
+        return None
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already running in this process
+        _active.release()
+        return None
+    return profiler
+
+
+def stop(profiler, route: str):
+    """
+    Stops a profiler returned by start and writes its stats.
+    """
+    try:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR, f"{time.time():.6f}-{name}.prof")
+        profiler.dump_stats(path)
+    finally:
+        _active.release()
@@ -0,0 +1,187 @@
+"""
+Local store of daily OHLCV bars, memory-mapped for zero-copy date slicing.
+
+Each ticker is ingested once from CSV or Parquet into a directory of .npy files:
+prices.npy holds open, high, low and close as float64 rows, volume.npy the
+int64 volumes and dates.npy the int64 day numbers that index the rows. Opened
+files are numpy.memmap arrays, so every process reading a ticker shares the
+same pages of the OS page cache.
+
+Usage: python -m market_data.store ingest --root market_data/bars TQQQ.csv QQQ.csv
+       python -m market_data.store info --root market_data/bars
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# date range the optimizer accepts, as enforced by the UI
+MIN_DATE = "2011-01-01"
+MAX_DATE = "2023-06-01"
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+def day_number(date) -> int:
+    # days since 1970-01-01, the unit of the date index
+    return int(np.datetime64(pd.Timestamp(date).date(), "D").astype(np.int64))
+
+
+class MarketDataStore:
+    """
+    Parameters
+    root: str
+        Directory holding one subdirectory per ticker
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def path(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper())
+
+    def tickers(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            # not the directories ingest is swapping in or out
+            if not name.startswith(".")
+            and os.path.isfile(os.path.join(self.root, name, "dates.npy"))
+        )
+
+    def ingest(self, ticker: str, source: str):
+        """
+        Converts a CSV or Parquet file with Date, Open, High, Low, Close and
+        Volume columns into the store's layout, replacing any previous data of
+        the ticker.
+        """
+        if source.endswith(".parquet"):
+            bars = pd.read_parquet(source)
+        else:
+            bars = pd.read_csv(source)
+
+        bars["Date"] = pd.to_datetime(bars["Date"]).dt.tz_localize(None)
+        bars = bars.sort_values("Date").drop_duplicates("Date", keep="last")
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix=f".{ticker.upper()}-")
+        np.save(
+            os.path.join(staging, "prices.npy"),
+            np.stack(
+                [bars[column.capitalize()].to_numpy(np.float64) for column in PRICE_COLUMNS]
+            ),
+        )
+        np.save(
+            os.path.join(staging, "volume.npy"), bars["Volume"].to_numpy(np.int64)
+        )
+        np.save(
+            os.path.join(staging, "dates.npy"),
+            bars["Date"].to_numpy().astype("datetime64[D]").astype(np.int64),
+        )
+
+        # swap the whole directory so readers never see half-written files, and
+        # move the old one aside first so the ticker never goes missing
+        replaced = None
+        with self._lock:
+            target = self.path(ticker)
+            if os.path.isdir(target):
+                replaced = tempfile.mkdtemp(
+                    dir=self.root, prefix=f".{ticker.upper()}-"
+                )
+                os.rename(target, os.path.join(replaced, "bars"))
+            os.rename(staging, target)
+            self._opened.pop(ticker.upper(), None)
+        if replaced is not None:
+            shutil.rmtree(replaced, ignore_errors=True)
+
+    def open(self, ticker: str) -> dict:
+        """
+        Returns the memory-mapped arrays of a ticker: 'dates', 'prices' and
+        'volume'.
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            arrays = self._opened.get(ticker)
+            if arrays is None:
+                if not os.path.isfile(os.path.join(self.path(ticker), "dates.npy")):
+                    raise KeyError(f"No market data for {ticker}")
+
+                arrays = {
+                    name: np.load(
+                        os.path.join(self.path(ticker), f"{name}.npy"), mmap_mode="r"
+                    )
+                    for name in ["dates", "prices", "volume"]
+                }
+                self._opened[ticker] = arrays
+            return arrays
+
+    def rows(self, ticker: str, start_date: str, end_date: str) -> slice:
+        """
+        Returns the rows from start_date to end_date inclusive, found by binary
+        search of the date index.
+
+        Raises ValueError if the range is outside MIN_DATE and MAX_DATE, reversed
+        or holds no bars of the ticker.
+        """
+        start, end = day_number(start_date), day_number(end_date)
+        if start < day_number(MIN_DATE) or end > day_number(MAX_DATE):
+            raise ValueError(f"Dates must be between {MIN_DATE} and {MAX_DATE}")
+        if start > end:
+            raise ValueError("Start date must be before end date")
+
+        dates = self.open(ticker)["dates"]
+        rows = slice(
+            int(np.searchsorted(dates, start, side="left")),
+            int(np.searchsorted(dates, end, side="right")),
+        )
+        if rows.start == rows.stop:
+            raise ValueError(f"{ticker} has no data for {start_date} to {end_date}")
+        return rows
+
+    def load(self, ticker: str, start_date: str = MIN_DATE, end_date: str = MAX_DATE) -> dict:
+        """
+        Returns the bars of a ticker between two dates as views of the mapped
+        files, in the same layout as backtest.load_ohlcv.
+        """
+        arrays = self.open(ticker)
+        rows = self.rows(ticker, start_date, end_date)
+
+        bars = {
+            column: arrays["prices"][i, rows] for i, column in enumerate(PRICE_COLUMNS)
+        }
+        bars["volume"] = arrays["volume"][rows]
+        bars["date"] = arrays["dates"][rows].astype("datetime64[D]")
+        return bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["ingest", "info"])
+    parser.add_argument("files", nargs="*", help="<TICKER>.csv or <TICKER>.parquet files")
+    parser.add_argument("--root", required=True)
+    args = parser.parse_args()
+
+    store = MarketDataStore(args.root)
+
+    if args.command == "ingest":
+        for source in args.files:
+            ticker = os.path.splitext(os.path.basename(source))[0]
+            store.ingest(ticker, source)
+            print(f"{ticker}: {len(store.open(ticker)['dates'])} bars")
+
+    for ticker in store.tickers():
+        dates = store.open(ticker)["dates"].astype("datetime64[D]")
+        print(f"{ticker}: {dates[0]} to {dates[-1]}, {len(dates)} bars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+
+from instrumentation.metrics import OPTIMIZER_REQUEST_SECONDS
+from optimization import optimizer_client
+from optimization.optimizer_client import (
+    ALGO_LIST_TIMEOUT,
+    OPTIMIZE_TIMEOUT,
+    parse_algo_list,
+    parse_results,
+)
+
+
+# seconds to wait for a connection to the optimizer
+CONNECT_TIMEOUT = 10
+
+# connections kept to the optimizer, requests beyond it wait for a free one
+MAX_CONNECTIONS = 100
+
+# attempts after the first one, and seconds before the first retry (doubled
+# every retry)
+RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# answers meaning the optimizer didn't take the request
+RETRY_STATUSES = {502, 503, 504}
+
+
+class AsyncOptimizerClient:
+    """
+    asyncio client of the optimizer microservice, the counterpart of
+    optimizer_client for code running on an event loop.
+
+    Requests share a pool of keep-alive connections, so many optimizations can
+    wait on the optimizer at once without a thread each. Failed requests are
+    retried with exponential backoff: the algorithm list on any connection
+    error, timeout or 502/503/504 answer, an optimization only when it can't
+    have started (the connection failed or the optimizer answered 503), since
+    retrying it would run it twice.
+
+    Parameters
+    base_url: str
+        Address of the optimizer, OPTIMIZER_URL by default
+    max_connections: int
+        Connections kept to the optimizer
+    retries: int
+        Attempts after the first one
+    retry_backoff: float
+        Seconds before the first retry
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        max_connections: int = MAX_CONNECTIONS,
+        retries: int = RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+    ) -> None:
+        self.base_url = base_url or optimizer_client.OPTIMIZER_URL
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            # waiting for a pooled connection is bounded by max_connections
+            timeout=httpx.Timeout(OPTIMIZE_TIMEOUT, connect=CONNECT_TIMEOUT, pool=None),
+        )
+
+    async def optimize(self, data: dict, timeout: float = OPTIMIZE_TIMEOUT) -> dict:
+        """
+        Runs an optimization, see optimizer_client.optimize.
+        """
+        with OPTIMIZER_REQUEST_SECONDS.time(endpoint="optimize"):
+            response = await self._request(
+                "POST",
+                "/optimize",
+                retry_errors=(httpx.ConnectError, httpx.ConnectTimeout),
+                retry_statuses={503},
+                json=data,
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT, pool=None),
+            )
+        return parse_results(response.json())
+
+    async def algo_list(self, timeout: float = ALGO_LIST_TIMEOUT) -> list[str]:
+        """
+        Returns the labels of the algorithms the optimizer runs, see
+        optimizer_client.algo_list.
+        """
+        with OPTIMIZER_REQUEST_SECONDS.time(endpoint="algo_list"):
+            response = await self._request(
+                "GET",
+                "/algo_list",
+                retry_errors=(httpx.TransportError,),
+                retry_statuses=RETRY_STATUSES,
+                timeout=timeout,
+            )
+        return parse_algo_list(response.json())
+
+    async def _request(
+        self, method: str, url: str, retry_errors: tuple, retry_statuses: set, **kwargs
+    ) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except retry_errors:
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in retry_statuses or last_attempt:
+                    response.raise_for_status()
+                    return response
+
+            await asyncio.sleep(self.retry_backoff * 2**attempt)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from database import async_controller
+from optimization.async_client import RETRIES, RETRY_BACKOFF, AsyncOptimizerClient
+from optimization.jobs import MEMO_TTL, OptimizationJobs
+from optimization.optimizer_client import ALGO_LIST_TIMEOUT
+
+
+class AsyncOptimizationJobs(OptimizationJobs):
+    """
+    Runs optimizations as coroutines on an event loop in a background thread,
+    instead of one pool thread per optimization.
+
+    A running optimization only holds a pooled connection to the optimizer
+    while it waits, so one instance can have many long optimizations in
+    flight. Its results and job updates are written with async_controller.
+    Submitting, coalescing and memoizing work as in OptimizationJobs.
+
+    Parameters
+    client: AsyncOptimizerClient
+        Client of the optimizer, created on the loop if not given
+    max_pending: int
+        Number of queued and running optimizations above which submissions are
+        rejected
+    memo_ttl: timedelta
+        Age up to which stored results are reused. None disables reuse
+    """
+
+    def __init__(
+        self,
+        client: AsyncOptimizerClient = None,
+        max_pending: int = 1000,
+        memo_ttl: timedelta = MEMO_TTL,
+    ) -> None:
+        # no pool threads are created, optimizations run on the loop
+        super().__init__(optimize=None, max_pending=max_pending, memo_ttl=memo_ttl)
+
+        self.client = client
+        # started by the first use, in the process that runs the jobs
+        self._loop = None
+        self._thread = None
+        self._loop_lock = threading.Lock()
+
+    def _start_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="optimization-loop", daemon=True
+                )
+                self._thread.start()
+                # the client's connection pool belongs to the loop it is created on
+                if self.client is None:
+                    self.client = asyncio.run_coroutine_threadsafe(
+                        self._create_client(), loop
+                    ).result()
+                self._loop = loop
+        return self._loop
+
+    @staticmethod
+    async def _create_client() -> AsyncOptimizerClient:
+        return AsyncOptimizerClient()
+
+    def call(self, coroutine, timeout: float = None):
+        """
+        Runs a coroutine on the jobs' event loop from another thread and
+        returns its result.
+        """
+        loop = self._start_loop()
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(timeout)
+
+    def algo_list(self) -> list[str]:
+        # for AlgorithmCatalog, which fetches from its own thread; waits for
+        # every attempt and the backoff between them
+        timeout = (RETRIES + 1) * ALGO_LIST_TIMEOUT + RETRY_BACKOFF * 2**RETRIES
+        self._start_loop()
+        return self.call(self.client.algo_list(), timeout=timeout)
+
+    def _start(self, job_id: str, data: dict, data_hash: str):
+        # called with the lock held
+        asyncio.run_coroutine_threadsafe(
+            self._run_async(job_id, data, data_hash), self._start_loop()
+        )
+
+    async def _run_async(self, job_id: str, data: dict, data_hash: str):
+        try:
+            await async_controller.update_job(
+                job_id, {"status": "running", "started": datetime.utcnow()}
+            )
+
+            optimized_results = await self.client.optimize(data)
+            timestamp = optimized_results["inputs"]["_id"]
+            optimized_results["inputs"]["input_hash"] = data_hash
+            run_id = await async_controller.add_results(optimized_results, timestamp)
+
+            await async_controller.update_job(
+                job_id,
+                {
+                    "status": "done",
+                    "result_id": run_id,
+                    "finished": datetime.utcnow(),
+                },
+            )
+
+        except Exception as e:
+            traceback.print_exc()
+            await async_controller.update_job(
+                job_id,
+                {"status": "failed", "error": str(e), "finished": datetime.utcnow()},
+            )
+
+        finally:
+            self._finish(data_hash)
+
+    def shutdown(self, wait: bool = True):
+        # running optimizations are abandoned, like daemon pool threads
+        if self._loop is not None:
+            self.call(self.client.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if wait:
+                self._thread.join()
+        super().shutdown(wait=wait)
@@ -0,0 +1,429 @@
+"""
+Local backtest engine for the four trading strategies.
+
+Indicators, entry/exit signals, stops and positions are computed as arrays over
+the whole price series, for a whole population of parameter sets at once.
+Results use the same metric names as the results of the optimizer
+microservice, so they can be stored and processed the same way.
+
+Usage: python -m optimization.backtest prices.csv Breakout WL=20 CSL=5 DSL=10 ATRP=14 ATRM=3 DB=1
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from database.schema import STRATEGY_PARAMS
+from optimization import indicators as ind
+
+
+STRATEGY_DESCRIPTIONS = {
+    "Breakout": "Buys when the close breaks DB% above the WL-day high and sells below the WL-day low.\n"
+    "Stops: CSL% below entry, DSL% below the highest close, ATRM x ATR(ATRP) below entry.",
+    "Acceleration": "Buys while the SW-day average is above the LW-day average and their spread widens.\n"
+    "Sells when the spread narrows.",
+    "Velocity": "Buys when the SW-day rate of change is positive and above the LW-day rate of change\n"
+    "while RSI(RSI) is below 70. Trailing stop TSL% below the highest close.",
+    "Exp/Con": "Buys when the SW-day ATR expands above the LW-day ATR with the close above its LW-day average.\n"
+    "Sells on contraction. Stops: CSL% below entry, ATRM x ATR(LW) below entry.",
+}
+
+# parameters that are window lengths, in bars
+WINDOW_PARAMS = {"WL", "SW", "LW", "ATRP", "RSI"}
+
+TRADING_DAYS = 252
+
+
+def load_ohlcv(path: str, start_date: str = None, end_date: str = None) -> dict:
+    """
+    Loads daily bars from a CSV file with Date, Open, High, Low, Close and Volume
+    columns (e.g. downloaded from Yahoo Finance) into NumPy arrays.
+    """
+    prices = pd.read_csv(path, parse_dates=["Date"]).sort_values("Date")
+    if start_date is not None:
+        prices = prices[prices["Date"] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        prices = prices[prices["Date"] <= pd.Timestamp(end_date)]
+
+    return {
+        "date": prices["Date"].to_numpy(),
+        "open": prices["Open"].to_numpy(np.float64),
+        "high": prices["High"].to_numpy(np.float64),
+        "low": prices["Low"].to_numpy(np.float64),
+        "close": prices["Close"].to_numpy(np.float64),
+        "volume": prices["Volume"].to_numpy(np.float64),
+    }
+
+
+def normalize_params(strategy: str, params: dict) -> dict:
+    # windows are whole bars of at least 1
+    normalized = {}
+    for name in STRATEGY_PARAMS[strategy]:
+        value = float(params[name])
+        if name in WINDOW_PARAMS:
+            value = max(1, int(round(value)))
+        normalized[name] = value
+    return normalized
+
+
+def normalize_population(strategy: str, population: np.ndarray) -> np.ndarray:
+    # same as normalize_params for every row of a population
+    population = np.array(population, dtype=np.float64, ndmin=2)
+    for column, name in enumerate(STRATEGY_PARAMS[strategy]):
+        if name in WINDOW_PARAMS:
+            population[:, column] = np.maximum(1, np.round(population[:, column]))
+    return population
+
+
+def format_inputs(params: dict) -> str:
+    # display string of the optimized parameters stored with each result
+    return "\n, ".join(f"{name}: {float(value):.4f}" for name, value in params.items())
+
+
+def indicator_rows(cache, name: str, compute, *windows: np.ndarray) -> np.ndarray:
+    """
+    Returns one row of an indicator per individual of a population.
+
+    The indicator is computed once per distinct window (or combination of
+    windows) and looked up in cache first, so individuals sharing a window share
+    the computation.
+
+    Parameters
+    cache: dict-like
+        Indicators already computed, keyed by (name, *windows), e.g. a dict or
+        an IndicatorCache scope
+    name: str
+        Name of the indicator, part of the cache key
+    compute: callable
+        Takes the windows as ints and returns the indicator series
+    windows: np.ndarray
+        Window of each individual, one array per argument of compute
+    """
+    keys = np.stack(windows, axis=1).astype(np.int64)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+
+    table = []
+    for row in unique:
+        key = (name, *(int(w) for w in row))
+        series = cache.get(key)
+        if series is None:
+            series = compute(*(int(w) for w in row))
+            cache[key] = series
+        table.append(series)
+
+    return np.stack(table)[inverse.reshape(-1)]
+
+
+def signals(strategy: str, prices: dict, population: np.ndarray, cache=None) -> dict:
+    """
+    Returns the entry and exit signals and stop settings of a strategy for every
+    individual of a population, as arrays with one row per individual.
+
+    Parameters
+    population: np.ndarray
+        One row per individual, one column per parameter in STRATEGY_PARAMS order
+    cache: dict-like
+        Indicators shared across calls, keyed by (indicator, *windows)
+    """
+    if cache is None:
+        cache = {}
+    population = normalize_population(strategy, population)
+    p = dict(zip(STRATEGY_PARAMS[strategy], population.T))
+    high, low, close = prices["high"], prices["low"], prices["close"]
+
+    if strategy == "Breakout":
+        upper = indicator_rows(
+            cache, "upper", lambda w: ind.shift(ind.rolling_max(high, w)), p["WL"]
+        )
+        lower = indicator_rows(
+            cache, "lower", lambda w: ind.shift(ind.rolling_min(low, w)), p["WL"]
+        )
+        atr = indicator_rows(cache, "atr", lambda w: ind.atr(high, low, close, w), p["ATRP"])
+        return {
+            "entry": close > upper * (1 + p["DB"][:, None] / 100),
+            "exit": close < lower,
+            "stop_loss": p["CSL"] / 100,
+            "trailing_stop": p["DSL"] / 100,
+            "stop_distance": p["ATRM"][:, None] * atr,
+        }
+
+    if strategy == "Acceleration":
+        def spread(short_window, long_window):
+            return ind.sma(close, short_window) - ind.sma(close, long_window)
+
+        spreads = indicator_rows(cache, "spread", spread, p["SW"], p["LW"])
+        acceleration = np.full(spreads.shape, np.nan)
+        acceleration[:, 1:] = np.diff(spreads, axis=1)
+        return {
+            "entry": (spreads > 0) & (acceleration > 0),
+            "exit": (spreads <= 0) | (acceleration < 0),
+        }
+
+    if strategy == "Velocity":
+        short_velocity = indicator_rows(cache, "roc", lambda w: ind.roc(close, w), p["SW"])
+        long_velocity = indicator_rows(cache, "roc", lambda w: ind.roc(close, w), p["LW"])
+        rsi = indicator_rows(cache, "rsi", lambda w: ind.rsi(close, w), p["RSI"])
+        return {
+            "entry": (short_velocity > 0)
+            & (short_velocity > long_velocity)
+            & (rsi < 70),
+            "exit": short_velocity < long_velocity,
+            "trailing_stop": p["TSL"] / 100,
+        }
+
+    if strategy == "Exp/Con":
+        def atr(w):
+            return ind.atr(high, low, close, w)
+
+        short_atr = indicator_rows(cache, "atr", atr, p["SW"])
+        long_atr = indicator_rows(cache, "atr", atr, p["LW"])
+        long_sma = indicator_rows(cache, "sma", lambda w: ind.sma(close, w), p["LW"])
+        return {
+            "entry": (short_atr > long_atr) & (close > long_sma),
+            "exit": short_atr < long_atr,
+            "stop_loss": p["CSL"] / 100,
+            "stop_distance": p["ATRM"][:, None] * long_atr,
+        }
+
+    raise ValueError(f"Unknown strategy {strategy}")
+
+
+def _previous(values: np.ndarray, fill=False) -> np.ndarray:
+    # values of the previous bar along the last axis
+    previous = np.empty_like(values)
+    previous[..., 0] = fill
+    previous[..., 1:] = values[..., :-1]
+    return previous
+
+
+def positions(
+    close: np.ndarray,
+    entry: np.ndarray,
+    exit: np.ndarray,
+    stop_loss=None,
+    trailing_stop=None,
+    stop_distance: np.ndarray = None,
+) -> np.ndarray:
+    """
+    Returns whether a long position is held at the close of each bar, with one
+    row per individual.
+
+    A position is opened on an entry signal and held until an exit signal or a
+    stop. Once stopped, the position stays flat until the next entry after an
+    exit signal. Stops of 0 are disabled.
+
+    Parameters
+    entry, exit: np.ndarray
+        Signals with one row per individual
+    stop_loss: float or np.ndarray
+        Fraction below the entry price that closes the position, per individual
+    trailing_stop: float or np.ndarray
+        Fraction below the highest close since entry that closes the position,
+        per individual
+    stop_distance: np.ndarray
+        Price distance below the entry price that closes the position, taken at
+        the entry bar
+    """
+    entry = np.atleast_2d(entry)
+    exit = np.atleast_2d(exit)
+    bars = np.broadcast_to(np.arange(close.shape[-1]), entry.shape)
+
+    # hold from an entry signal to the next exit signal
+    state = np.full(entry.shape, np.nan)
+    state[exit] = 0.0
+    state[entry & ~exit] = 1.0
+    last_signal = np.maximum.accumulate(np.where(np.isnan(state), 0, bars), axis=-1)
+    in_regime = np.take_along_axis(state, last_signal, axis=-1) == 1.0
+
+    starts = in_regime & ~_previous(in_regime)
+    start_bar = np.maximum.accumulate(np.where(starts, bars, 0), axis=-1)
+    entry_price = close[start_bar]
+
+    stopped = np.zeros(entry.shape, dtype=bool)
+    if stop_loss is not None:
+        stop_loss = np.asarray(stop_loss, dtype=np.float64)[..., None]
+        stopped |= (stop_loss > 0) & (close < entry_price * (1 - stop_loss))
+    if trailing_stop is not None:
+        trailing_stop = np.asarray(trailing_stop, dtype=np.float64)[..., None]
+        # highest close since the start of each regime, offsetting every regime
+        # above the previous ones so the running maximum restarts
+        regime = np.cumsum(starts, axis=-1)
+        offset = regime * (np.nanmax(close) - np.nanmin(close) + 1.0)
+        highest = np.maximum.accumulate(close + offset, axis=-1) - offset
+        stopped |= (trailing_stop > 0) & (close < highest * (1 - trailing_stop))
+    if stop_distance is not None:
+        distance = np.take_along_axis(np.atleast_2d(stop_distance), start_bar, axis=-1)
+        stopped |= close < entry_price - distance
+    stopped &= in_regime
+
+    # flat for the rest of a regime once a stop is hit
+    stops_so_far = np.cumsum(stopped, axis=-1)
+    stops_before_start = np.take_along_axis(
+        stops_so_far - stopped, start_bar, axis=-1
+    )
+    return in_regime & (stops_so_far == stops_before_start)
+
+
+def _per_row(rows: np.ndarray, values: np.ndarray, num_rows: int) -> np.ndarray:
+    # mean of values grouped by row, NaN for rows without values
+    counts = np.bincount(rows, minlength=num_rows)
+    sums = np.bincount(rows, weights=values, minlength=num_rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / counts
+
+
+def metrics(
+    close: np.ndarray, position: np.ndarray, cash: float = 10000, commission: float = 0.002
+) -> dict:
+    """
+    Returns the performance metrics of holding position over close, with the
+    commission charged on every buy and sell. Every metric is an array with one
+    value per row of position.
+    """
+    position = np.atleast_2d(position)
+    num_rows, n = position.shape
+
+    bar_return = np.zeros(n)
+    bar_return[1:] = close[1:] / close[:-1] - 1
+    held = _previous(position)
+
+    trades = position != held
+    strategy_return = held * bar_return - commission * trades
+    equity = cash * np.cumprod(1 + strategy_return, axis=-1)
+
+    # average depth of the drawdown periods, found on the flattened rows
+    drawdown = equity / np.maximum.accumulate(equity, axis=-1) - 1
+    in_drawdown = drawdown < 0
+    period_starts = np.flatnonzero(in_drawdown & ~_previous(in_drawdown))
+    if len(period_starts):
+        period_depths = np.minimum.reduceat(
+            np.where(in_drawdown, drawdown, 0).ravel(), period_starts
+        )
+        avg_drawdown = _per_row(period_starts // n, period_depths, num_rows)
+        avg_drawdown = np.nan_to_num(avg_drawdown)
+    else:
+        avg_drawdown = np.zeros(num_rows)
+
+    # trade returns from the cumulative log return at entry and exit, where the
+    # k-th entry of a row is closed by its k-th exit or by the last bar
+    exits = ~position & held
+    exits[:, -1] |= position[:, -1]
+    entries = np.flatnonzero(position & ~held)
+    exits = np.flatnonzero(exits)
+    log_equity = np.zeros((num_rows, n + 1))
+    log_equity[:, 1:] = np.cumsum(np.log1p(strategy_return), axis=-1)
+    entry_rows, entry_bars = np.divmod(entries, n)
+    exit_rows, exit_bars = np.divmod(exits, n)
+    trade_returns = (
+        np.exp(log_equity[exit_rows, exit_bars + 1] - log_equity[entry_rows, entry_bars])
+        - 1
+    )
+
+    volatility = strategy_return.std(axis=-1) * np.sqrt(TRADING_DAYS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(
+            volatility > 0,
+            strategy_return.mean(axis=-1) * TRADING_DAYS / volatility,
+            0.0,
+        )
+
+    return {
+        "# Trades": np.bincount(entry_rows, minlength=num_rows),
+        "Equity Final ($)": equity[:, -1],
+        "Return (%)": (equity[:, -1] / cash - 1) * 100,
+        "Max Drawdown (%)": drawdown.min(axis=-1) * 100,
+        "Avg Drawdown (%)": avg_drawdown * 100,
+        "Win Rate (%)": _per_row(entry_rows, trade_returns > 0, num_rows) * 100,
+        "Sharpe Ratio": sharpe,
+        "Exposure Time (%)": held.mean(axis=-1) * 100,
+        "Volatility (%)": volatility * 100,
+        "Buy & Hold Return (%)": np.full(num_rows, (close[-1] / close[0] - 1) * 100),
+    }
+
+
+def evaluate(
+    prices: dict,
+    strategy: str,
+    population: np.ndarray,
+    cash: float = 10000,
+    commission: float = 0.002,
+    cache=None,
+    chunk_size: int = 256,
+) -> dict:
+    """
+    Backtests every individual of a population at once and returns each metric
+    as an array with one value per individual.
+
+    Individuals are evaluated in chunks of chunk_size rows to bound memory, and
+    indicators are computed once per distinct window for the whole population.
+
+    Parameters
+    prices: dict
+        NumPy arrays 'high', 'low' and 'close', e.g. from load_ohlcv
+    strategy: str
+        Should be either 'Exp/Con', 'Acceleration', 'Breakout' or 'Velocity'
+    population: np.ndarray
+        One row per individual, one column per parameter in STRATEGY_PARAMS order
+    cache: dict-like
+        Indicators shared across calls, keyed by (indicator, *windows)
+    """
+    if cache is None:
+        cache = {}
+    population = np.array(population, dtype=np.float64, ndmin=2)
+
+    chunks = []
+    for start in range(0, len(population), chunk_size):
+        chunk_signals = signals(
+            strategy, prices, population[start : start + chunk_size], cache
+        )
+        position = positions(prices["close"], **chunk_signals)
+        chunks.append(metrics(prices["close"], position, cash, commission))
+
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+
+
+def backtest(
+    prices: dict, strategy: str, params: dict, cash: float = 10000, commission: float = 0.002
+) -> dict:
+    """
+    Backtests one strategy with one set of parameters.
+
+    Parameters
+    prices: dict
+        NumPy arrays 'high', 'low' and 'close', e.g. from load_ohlcv
+    strategy: str
+        Should be either 'Exp/Con', 'Acceleration', 'Breakout' or 'Velocity'
+    params: dict
+        Value of each of the strategy's parameters in STRATEGY_PARAMS
+    """
+    params = normalize_params(strategy, params)
+    evaluated = evaluate(
+        prices, strategy, [list(params.values())], cash, commission
+    )
+
+    result = {"inputs": format_inputs(params)}
+    result.update({name: values[0].item() for name, values in evaluated.items()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("data", help="CSV file of daily OHLCV bars")
+    parser.add_argument("strategy", choices=list(STRATEGY_PARAMS))
+    parser.add_argument("params", nargs="+", help="NAME=VALUE for each parameter")
+    parser.add_argument("--start-date")
+    parser.add_argument("--end-date")
+    parser.add_argument("--cash", type=float, default=10000)
+    parser.add_argument("--commission", type=float, default=0.002)
+    args = parser.parse_args()
+
+    params = dict(p.split("=", 1) for p in args.params)
+    prices = load_ohlcv(args.data, args.start_date, args.end_date)
+    result = backtest(prices, args.strategy, params, args.cash, args.commission)
+
+    for name, value in result.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
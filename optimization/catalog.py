@@ -0,0 +1,92 @@
+import threading
+import time
+import traceback
+
+from optimization import optimizer_client
+
+
+# seconds the algorithm list is served before it is refreshed
+CATALOG_TTL = 3600
+
+# seconds to wait before retrying after the optimizer couldn't be reached
+RETRY_INTERVAL = 60
+
+
+class AlgorithmCatalog:
+    """
+    Labels of the algorithms the optimizer runs, for the index page.
+
+    The list is fetched from the optimizer in a background thread and served
+    from memory, so rendering a page never waits for the optimizer. Until the
+    first fetch succeeds the fallback labels are served; once the list is older
+    than ttl it is still served while a refresh runs.
+
+    Parameters
+    fallback: list[str]
+        Labels served while the optimizer's list is unknown
+    fetch: callable
+        Returns the optimizer's labels, defaults to optimizer_client.algo_list
+    ttl: float
+        Seconds before the list is refreshed
+    """
+
+    def __init__(
+        self,
+        fallback: list[str],
+        fetch=optimizer_client.algo_list,
+        ttl: float = CATALOG_TTL,
+        retry_interval: float = RETRY_INTERVAL,
+    ) -> None:
+        self.fallback = list(fallback)
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+
+        self._labels = None
+        self._expires = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def labels(self) -> list[str]:
+        """
+        Returns the cached labels, or the fallback, and starts a background
+        refresh if they are missing or stale.
+        """
+        with self._lock:
+            labels = self._labels
+            if time.monotonic() >= self._expires:
+                self._start_refresh()
+
+        return list(labels if labels is not None else self.fallback)
+
+    def warm_up(self):
+        # fetches the labels in the background before the first page is served
+        with self._lock:
+            self._start_refresh()
+
+    def _start_refresh(self):
+        # called with the lock held
+        if not self._refreshing:
+            self._refreshing = True
+            threading.Thread(
+                target=self.refresh, name="algorithm-catalog", daemon=True
+            ).start()
+
+    def refresh(self):
+        """
+        Fetches the labels from the optimizer. On failure the labels served so
+        far are kept and the fetch is retried after retry_interval.
+        """
+        try:
+            labels = self.fetch()
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self._expires = time.monotonic() + self.retry_interval
+                self._refreshing = False
+            return
+
+        with self._lock:
+            self._labels = labels
+            self._expires = time.monotonic() + self.ttl
+            self._refreshing = False
@@ -0,0 +1,185 @@
+from datetime import datetime
+
+import numpy as np
+
+from database.schema import STRATEGY_PARAMS
+from optimization.backtest import (
+    STRATEGY_DESCRIPTIONS,
+    evaluate,
+    format_inputs,
+    normalize_population,
+)
+
+
+# search range of each parameter
+PARAM_BOUNDS = {
+    "WL": (5, 200),
+    "SW": (2, 50),
+    "LW": (20, 250),
+    "CSL": (1, 20),
+    "DSL": (1, 30),
+    "ATRP": (5, 50),
+    "ATRM": (0.5, 6),
+    "DB": (0, 5),
+    "RSI": (5, 30),
+    "TSL": (1, 30),
+}
+
+# fraction of the best individuals carried over to the next generation unchanged
+ELITE_FRACTION = 0.1
+MUTATION_RATE = 0.2
+
+
+def optimize_strategy(
+    prices: dict,
+    strategy: str,
+    population_size: int,
+    generations: int,
+    cash: float = 10000,
+    commission: float = 0.002,
+    seed: int = None,
+    cache=None,
+):
+    """
+    Optimizes a strategy's parameters for return with a genetic algorithm.
+
+    Each generation is scored with a single batched evaluate call, and the
+    indicator cache is shared across generations, so windows already seen are
+    not computed again.
+
+    Returns the final population, one row per individual, and its metrics.
+    """
+    if cache is None:
+        cache = {}
+    rng = np.random.default_rng(seed)
+    names = STRATEGY_PARAMS[strategy]
+    low = np.array([PARAM_BOUNDS[name][0] for name in names], dtype=np.float64)
+    high = np.array([PARAM_BOUNDS[name][1] for name in names], dtype=np.float64)
+
+    population = normalize_population(
+        strategy, rng.uniform(low, high, size=(population_size, len(names)))
+    )
+    results = evaluate(prices, strategy, population, cash, commission, cache)
+
+    for _ in range(generations - 1):
+        fitness = np.nan_to_num(results["Return (%)"], nan=-np.inf)
+        elite_count = max(1, int(population_size * ELITE_FRACTION))
+        elite = population[np.argsort(fitness)[::-1][:elite_count]]
+
+        # tournament selection of two parents per child
+        num_children = population_size - elite_count
+        contenders = rng.integers(0, population_size, size=(2, num_children, 3))
+        winners = np.take_along_axis(
+            contenders, fitness[contenders].argmax(axis=-1)[..., None], axis=-1
+        )[..., 0]
+        mothers, fathers = population[winners[0]], population[winners[1]]
+
+        # blend crossover followed by gaussian mutation
+        weights = rng.uniform(size=mothers.shape)
+        children = weights * mothers + (1 - weights) * fathers
+        mutate = rng.uniform(size=children.shape) < MUTATION_RATE
+        children += mutate * rng.normal(0, 0.1, size=children.shape) * (high - low)
+        children = normalize_population(strategy, np.clip(children, low, high))
+
+        population = np.concatenate([elite, children])
+        results = evaluate(prices, strategy, population, cash, commission, cache)
+
+    return population, results
+
+
+def strategy_document(strategy: str, population: np.ndarray, results: dict) -> dict:
+    # results of one strategy in the shape the optimizer microservice returns
+    return {
+        "description": STRATEGY_DESCRIPTIONS[strategy],
+        "results": {
+            str(i): {
+                "0": {
+                    "inputs": format_inputs(
+                        dict(zip(STRATEGY_PARAMS[strategy], individual))
+                    ),
+                    "params": {
+                        name: float(value)
+                        for name, value in zip(STRATEGY_PARAMS[strategy], individual)
+                    },
+                    **{name: values[i].item() for name, values in results.items()},
+                }
+            }
+            for i, individual in enumerate(population)
+        },
+    }
+
+
+def run_inputs(
+    timestamp: datetime,
+    ticker: str,
+    population_size: int,
+    generations: int,
+    start_date: str,
+    end_date: str,
+    cash: float = 10000,
+    commission: float = 0.002,
+) -> dict:
+    # "inputs" document of an optimization run
+    return {
+        "_id": timestamp,
+        "ticker": ticker,
+        "population_size": population_size,
+        "generations": generations,
+        "cash": cash,
+        "commission": commission,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+
+def optimize(
+    prices: dict,
+    ticker: str,
+    population_size: int,
+    generations: int,
+    selected_algos: list,
+    start_date: str,
+    end_date: str,
+    cash: float = 10000,
+    commission: float = 0.002,
+    seed: int = None,
+    cache=None,
+) -> dict:
+    """
+    Runs an optimization locally and returns a document shaped like the results
+    of the optimizer microservice, with the same inputs run_optimization sends.
+
+    Parameters
+    selected_algos: list[bool]
+        Whether to optimize each strategy, in STRATEGY_PARAMS order
+    cache: IndicatorCache
+        Indicators shared with other runs, otherwise they are only shared
+        between the strategies of this run
+    """
+    # strategies reuse each other's indicators, e.g. ATR windows
+    cache = {} if cache is None else cache.scope(ticker, start_date, end_date)
+
+    timestamp = datetime.utcnow().replace(microsecond=0)
+    document = {
+        "inputs": run_inputs(
+            timestamp,
+            ticker,
+            population_size,
+            generations,
+            start_date,
+            end_date,
+            cash,
+            commission,
+        )
+    }
+
+    for strategy, selected in zip(STRATEGY_PARAMS, selected_algos):
+        if not selected:
+            continue
+
+        population, results = optimize_strategy(
+            prices, strategy, population_size, generations, cash, commission, seed, cache
+        )
+        document[strategy] = strategy_document(strategy, population, results)
+
+    return document
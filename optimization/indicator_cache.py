@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class IndicatorCache:
+    """
+    LRU cache of indicator series shared by backtests of the same prices.
+
+    Series are keyed by (ticker, start_date, end_date, indicator, *windows), so
+    each window of an indicator is computed once per price series and reused
+    across individuals, generations and strategies. Series are evicted least
+    recently used first once max_bytes is exceeded; with a spill_dir, evicted
+    series are written there as .npy files and mapped back in on the next
+    lookup instead of being recomputed.
+
+    Spilled files are only valid for the prices they were computed from, so the
+    spill directory should be cleared when market data is re-ingested.
+
+    Parameters
+    max_bytes: int
+        Maximum total size of the series held in memory
+    spill_dir: str
+        Directory for evicted series, or None to drop them
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20, spill_dir: str = None) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.size_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def scope(self, ticker: str, start_date: str, end_date: str) -> "IndicatorScope":
+        """
+        Returns a dict-like view of the cache for one price series, for use as
+        the cache argument of backtest.evaluate.
+        """
+        return IndicatorScope(self, (ticker, str(start_date), str(end_date)))
+
+    def _spill_path(self, key: tuple) -> str:
+        return os.path.join(
+            self.spill_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".npy"
+        )
+
+    def get(self, key: tuple):
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+                self.hits += 1
+                return series
+
+        if self.spill_dir is not None:
+            path = self._spill_path(key)
+            if os.path.isfile(path):
+                series = np.load(path, mmap_mode="r")
+                with self._lock:
+                    self.disk_hits += 1
+                self._insert(key, series)
+                return series
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: tuple, series: np.ndarray):
+        series = np.asarray(series)
+        series.flags.writeable = False
+        self._insert(key, series)
+
+    def _insert(self, key: tuple, series: np.ndarray):
+        evicted = []
+        with self._lock:
+            if key in self._series:
+                self.size_bytes -= self._series.pop(key).nbytes
+
+            if series.nbytes <= self.max_bytes:
+                self._series[key] = series
+                self.size_bytes += series.nbytes
+            else:
+                evicted.append((key, series))
+
+            while self.size_bytes > self.max_bytes:
+                evicted_key, evicted_series = self._series.popitem(last=False)
+                self.size_bytes -= evicted_series.nbytes
+                self.evictions += 1
+                evicted.append((evicted_key, evicted_series))
+
+        # written outside the lock
+        if self.spill_dir is not None:
+            for evicted_key, evicted_series in evicted:
+                self._spill(evicted_key, evicted_series)
+
+    def _spill(self, key: tuple, series: np.ndarray):
+        path = self._spill_path(key)
+        if os.path.isfile(path):
+            # series mapped back in from disk are already spilled
+            return
+
+        # rename so concurrent readers never map a half-written file
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, "wb") as f:
+            np.save(f, series)
+        os.replace(staging, path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._series),
+                "size_bytes": self.size_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+
+class IndicatorScope:
+    """
+    Indicators of one price series in an IndicatorCache, keyed like the plain
+    dicts backtest.evaluate otherwise uses: (indicator, *windows).
+    """
+
+    def __init__(self, cache: IndicatorCache, prefix: tuple) -> None:
+        self.cache = cache
+        self.prefix = prefix
+
+    def get(self, key: tuple, default=None):
+        series = self.cache.get(self.prefix + key)
+        return default if series is None else series
+
+    def __setitem__(self, key: tuple, series: np.ndarray):
+        self.cache.put(self.prefix + key, series)
@@ -0,0 +1,98 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+
+# Indicators over a whole price series. Every function returns an array of the
+# same length as its input, NaN until enough bars are available.
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if window > len(values):
+        return result
+
+    cumsum = np.cumsum(np.insert(values.astype(np.float64), 0, 0.0))
+    result[window - 1 :] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def ema(values: np.ndarray, window: int, alpha: float = None) -> np.ndarray:
+    # y[t] = alpha * x[t] + (1 - alpha) * y[t - 1], started at the first value
+    if alpha is None:
+        alpha = 2.0 / (window + 1)
+    values = values.astype(np.float64)
+    if len(values) == 0:
+        return values
+
+    result, _ = lfilter(
+        [alpha], [1.0, alpha - 1.0], values, zi=[(1.0 - alpha) * values[0]]
+    )
+    return result
+
+
+def wilder(values: np.ndarray, window: int) -> np.ndarray:
+    # Wilder's smoothing, used by ATR and RSI
+    result = np.full(len(values), np.nan)
+    if window > len(values):
+        return result
+
+    # seeded with the mean of the first window
+    seeded = np.insert(values[window:], 0, values[:window].mean())
+    result[window - 1 :] = ema(seeded, window, alpha=1.0 / window)
+    return result
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    previous_close = np.insert(close[:-1], 0, close[0])
+    return np.maximum(high, previous_close) - np.minimum(low, previous_close)
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    return wilder(true_range(high, low, close), window)
+
+
+def rsi(close: np.ndarray, window: int) -> np.ndarray:
+    change = np.diff(close, prepend=close[0] if len(close) else 0.0)
+    gain = wilder(np.clip(change, 0, None), window)
+    loss = wilder(np.clip(-change, 0, None), window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 100.0 - 100.0 / (1.0 + gain / loss)
+    result[(loss == 0) & ~np.isnan(gain)] = 100.0
+    return result
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if window > len(values):
+        return result
+
+    result[window - 1 :] = sliding_window_view(values, window).max(axis=1)
+    return result
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if window > len(values):
+        return result
+
+    result[window - 1 :] = sliding_window_view(values, window).min(axis=1)
+    return result
+
+
+def roc(values: np.ndarray, window: int) -> np.ndarray:
+    # rate of change over window bars, in percent
+    result = np.full(len(values), np.nan)
+    if window >= len(values):
+        return result
+
+    result[window:] = (values[window:] / values[:-window] - 1.0) * 100.0
+    return result
+
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if periods < len(values):
+        result[periods:] = values[: len(values) - periods]
+    return result
@@ -0,0 +1,224 @@
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import database.database_controller as db
+from optimization import optimizer_client
+from optimization.memo import input_hash
+
+
+# how long the results of an optimization are reused for identical inputs
+MEMO_TTL = timedelta(days=7)
+
+# seconds between updates of the heartbeats of the jobs an instance runs, and
+# age of a heartbeat after which its queued or running job counts as lost
+HEARTBEAT_INTERVAL = 30
+JOB_TIMEOUT = timedelta(minutes=5)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class OptimizationJobs:
+    """
+    Runs optimizations in a bounded pool of background threads.
+
+    Submitting an optimization returns a job id right away. The job's status is
+    kept in the optimization_jobs collection, so any instance behind the load
+    balancer can answer status requests, and its results are stored with
+    add_results once the optimizer answers.
+
+    Inputs are identified by a hash of their canonical form. Submitting inputs
+    that are already queued or running returns the existing job, and inputs
+    optimized within memo_ttl are answered with the stored run without calling
+    the optimizer.
+
+    Every HEARTBEAT_INTERVAL seconds the instance updates the heartbeat of the
+    jobs it runs. Jobs whose heartbeat is older than JOB_TIMEOUT, e.g. because
+    their instance crashed, are marked failed when they are looked up, so they
+    don't block identical submissions.
+
+    Parameters
+    optimize: callable
+        Takes the optimization inputs and returns the optimized results
+    max_workers: int
+        Number of optimizations run at the same time
+    max_pending: int
+        Number of queued and running optimizations above which submissions are
+        rejected
+    memo_ttl: timedelta
+        Age up to which stored results are reused. None disables reuse
+    """
+
+    def __init__(
+        self,
+        optimize=optimizer_client.optimize,
+        max_workers: int = 4,
+        max_pending: int = 32,
+        memo_ttl: timedelta = MEMO_TTL,
+    ) -> None:
+        self.optimize = optimize
+        self.max_pending = max_pending
+        self.memo_ttl = memo_ttl
+
+        self.max_workers = max_workers
+        # created by the first optimization run in a pool thread
+        self._executor = None
+        self._pending = 0
+        self._in_flight = {}
+        self._indexes_created = False
+        self._lock = threading.Lock()
+
+        self._stopped = threading.Event()
+        # started by the first submission, in the process that runs the jobs
+        self._heartbeat = None
+
+    def submit(self, data: dict) -> str:
+        data_hash = input_hash(data)
+
+        # database calls are made without the lock, which only guards the
+        # bookkeeping of the jobs this instance runs
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(
+                    target=self._beat, name="optimization-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+            # share the job of identical inputs that are still being optimized
+            job_id = self._in_flight.get(data_hash)
+            if job_id is not None:
+                return job_id
+
+        if not self._indexes_created:
+            db.create_indexes()
+            self._indexes_created = True
+
+        db.fail_stale_jobs({"input_hash": data_hash}, self._stale_before())
+        active_job = db.get_active_job(data_hash)
+        if active_job is not None:
+            return active_job["_id"]
+
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "status": "queued",
+            "inputs": data,
+            "input_hash": data_hash,
+            "created": now,
+            "heartbeat": now,
+        }
+
+        # reuse a recent run of identical inputs
+        if self.memo_ttl is not None:
+            run = db.get_run_by_hash(data_hash, now - self.memo_ttl)
+            if run is not None:
+                job.update(
+                    {
+                        "status": "done",
+                        "result_id": run["_id"],
+                        "memoized": True,
+                        "finished": job["created"],
+                    }
+                )
+                db.add_job(job)
+                return job_id
+
+        with self._lock:
+            # identical inputs submitted while the database was queried
+            in_flight_id = self._in_flight.get(data_hash)
+            if in_flight_id is not None:
+                return in_flight_id
+
+            if self._pending >= self.max_pending:
+                raise QueueFullError(
+                    f"{self._pending} optimizations are already queued or running"
+                )
+
+            self._pending += 1
+            self._in_flight[data_hash] = job_id
+
+        try:
+            db.add_job(job)
+        except Exception:
+            self._finish(data_hash)
+            raise
+        with self._lock:
+            self._start(job_id, data, data_hash)
+
+        return job_id
+
+    def _start(self, job_id: str, data: dict, data_hash: str):
+        # called with the lock held
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="optimization"
+            )
+        self._executor.submit(self._run, job_id, data, data_hash)
+
+    def _run(self, job_id: str, data: dict, data_hash: str):
+        try:
+            db.update_job(job_id, {"status": "running", "started": datetime.utcnow()})
+
+            optimized_results = self.optimize(data)
+            timestamp = optimized_results["inputs"]["_id"]
+            optimized_results["inputs"]["input_hash"] = data_hash
+            run_id = db.add_results(optimized_results, timestamp)
+
+            db.update_job(
+                job_id,
+                {
+                    "status": "done",
+                    "result_id": run_id,
+                    "finished": datetime.utcnow(),
+                },
+            )
+
+        except Exception as e:
+            traceback.print_exc()
+            db.update_job(
+                job_id,
+                {"status": "failed", "error": str(e), "finished": datetime.utcnow()},
+            )
+
+        finally:
+            self._finish(data_hash)
+
+    def _finish(self, data_hash: str):
+        with self._lock:
+            self._pending -= 1
+            self._in_flight.pop(data_hash, None)
+
+    def get(self, job_id: str):
+        job = db.get_job(job_id)
+        if (
+            job is not None
+            and job["status"] in db.ACTIVE_JOB_STATUSES
+            and db.fail_stale_jobs({"_id": job_id}, self._stale_before())
+        ):
+            job = db.get_job(job_id)
+        return job
+
+    @staticmethod
+    def _stale_before() -> datetime:
+        return datetime.utcnow() - JOB_TIMEOUT
+
+    def _beat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                job_ids = list(self._in_flight.values())
+            if not job_ids:
+                continue
+            try:
+                db.touch_jobs(job_ids)
+            except Exception:
+                traceback.print_exc()
+
+    def shutdown(self, wait: bool = True):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,34 @@
+import hashlib
+import json
+
+
+def canonical_inputs(data: dict) -> dict:
+    """
+    Normalizes optimization inputs so equal requests compare equal, e.g. "spy"
+    and "SPY" or a population size sent as "10" and 10. Raises ValueError if
+    the population size or number of generations isn't a positive integer.
+    """
+    return {
+        "ticker": str(data["ticker"]).strip().upper(),
+        "population_size": _positive_int(data["population_size"], "Population size"),
+        "generations": _positive_int(data["generations"], "Generations"),
+        "start_date": str(data["start_date"]),
+        "end_date": str(data["end_date"]),
+        "selected_algos": [bool(a) for a in data.get("selected_algos") or []],
+    }
+
+
+def _positive_int(value, name: str) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer, not {value!r}") from None
+    if number < 1:
+        raise ValueError(f"{name} must be at least 1, not {value!r}")
+    return number
+
+
+def input_hash(data: dict) -> str:
+    # content address of an optimization's inputs
+    canonical = json.dumps(canonical_inputs(data), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
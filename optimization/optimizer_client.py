@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+
+import requests
+
+from instrumentation.metrics import OPTIMIZER_REQUEST_SECONDS
+
+
+# address of the optimizer microservice, e.g. a local stub while testing
+OPTIMIZER_URL = os.environ.get("OPTIMIZER_URL", "http://18.222.8.195:5000")
+
+# format of the timestamps the optimizer returns
+DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
+
+# seconds to wait for a genetic algorithm run, which can take over an hour
+OPTIMIZE_TIMEOUT = 4000
+
+# seconds to wait for the list of algorithms, which must not hold up a page
+ALGO_LIST_TIMEOUT = 5
+
+
+@OPTIMIZER_REQUEST_SECONDS.time(endpoint="optimize")
+def optimize(data: dict, timeout: float = OPTIMIZE_TIMEOUT) -> dict:
+    """
+    Runs an optimization on the optimizer microservice and returns its results,
+    with the run's timestamp parsed into a datetime.
+
+    Parameters
+    data: dict
+        Keys 'ticker', 'population_size', 'generations', 'start_date', 'end_date'
+        and 'selected_algos'
+    timeout: float
+        Seconds to wait for the optimizer to answer
+    """
+    response = requests.post(f"{OPTIMIZER_URL}/optimize", json=data, timeout=timeout)
+    response.raise_for_status()
+    return parse_results(response.json())
+
+
+@OPTIMIZER_REQUEST_SECONDS.time(endpoint="algo_list")
+def algo_list(timeout: float = ALGO_LIST_TIMEOUT) -> list[str]:
+    """
+    Returns the labels of the algorithms the optimizer runs, in the order of
+    the selected_algos flags it expects.
+    """
+    response = requests.get(f"{OPTIMIZER_URL}/algo_list", timeout=timeout)
+    response.raise_for_status()
+    return parse_algo_list(response.json())
+
+
+def parse_results(optimized_results: dict) -> dict:
+    # the run's timestamp is sent as an HTTP date
+    optimized_results["inputs"]["_id"] = datetime.strptime(
+        optimized_results["inputs"]["_id"], DATE_FORMAT
+    )
+    return optimized_results
+
+
+def parse_algo_list(labels) -> list[str]:
+    if not isinstance(labels, list) or not all(isinstance(l, str) for l in labels):
+        raise ValueError(f"Unexpected algorithm list {labels!r}")
+    return labels
@@ -0,0 +1,406 @@
+"""
+Optimizes many (ticker, strategy, date range) combinations across a process pool.
+
+Usage: python -m optimization.sweep --data-dir prices --tickers TQQQ TNA QQQ
+           --ranges 2011-01-01:2023-06-01 2016-01-01:2023-06-01 --workers 8
+
+With --store, bars are read from a market_data.store directory instead, which
+every worker maps directly rather than receiving a shared memory copy.
+"""
+import argparse
+import os
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from database.schema import STRATEGY_PARAMS
+from market_data.store import MarketDataStore
+from optimization.backtest import load_ohlcv
+from optimization.genetic import optimize_strategy, run_inputs, strategy_document
+from optimization.indicator_cache import IndicatorCache
+from optimization.memo import input_hash
+
+
+# price columns shared with the workers, in row order
+PRICE_COLUMNS = ["high", "low", "close"]
+
+# indicator cache counters summed over all workers
+CACHE_COUNTERS = ["hits", "disk_hits", "misses", "evictions"]
+
+
+class SharedPrices:
+    """
+    Daily bars of several tickers in shared memory.
+
+    Each ticker's high, low and close are stored in one float64 block and its
+    dates in an int64 block, which workers map read-only instead of receiving a
+    copy of the data with every task.
+    """
+
+    def __init__(self, prices: dict) -> None:
+        self._blocks = []
+        self.descriptor = {}
+
+        for ticker, bars in prices.items():
+            values = np.stack([bars[column] for column in PRICE_COLUMNS])
+            dates = bars["date"].astype("datetime64[D]").astype(np.int64)
+            self.descriptor[ticker] = (
+                self._share(values),
+                self._share(dates),
+                values.shape,
+            )
+
+    def _share(self, array: np.ndarray) -> str:
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self._blocks.append(block)
+        return block.name
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+# prices attached by each worker process: {ticker: (values, dates)}
+_worker_prices = {}
+_worker_blocks = []
+_worker_store = None
+_worker_cache = None
+
+
+def _attach(descriptor: dict, cache_options: dict, store_root: str = None):
+    # runs once in every worker process
+    global _worker_store, _worker_cache
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # tasks of the same ticker and date range on a worker share indicators
+    _worker_cache = IndicatorCache(**cache_options)
+
+    if store_root is not None:
+        _worker_store = MarketDataStore(store_root)
+
+    for ticker, (values_name, dates_name, shape) in descriptor.items():
+        values_block = shared_memory.SharedMemory(name=values_name)
+        dates_block = shared_memory.SharedMemory(name=dates_name)
+        _worker_blocks.extend([values_block, dates_block])
+
+        values = np.ndarray(shape, dtype=np.float64, buffer=values_block.buf)
+        dates = np.ndarray(shape[1:], dtype=np.int64, buffer=dates_block.buf)
+        values.flags.writeable = False
+        dates.flags.writeable = False
+        _worker_prices[ticker] = (values, dates)
+
+
+def _slice_prices(ticker: str, start_date: str, end_date: str) -> dict:
+    # bars from start_date to end_date inclusive, as views of the shared block
+    if _worker_store is not None:
+        return _worker_store.load(ticker, start_date, end_date)
+
+    values, dates = _worker_prices[ticker]
+    start = np.searchsorted(dates, np.datetime64(start_date, "D").astype(np.int64), "left")
+    end = np.searchsorted(dates, np.datetime64(end_date, "D").astype(np.int64), "right")
+    return {column: values[row, start:end] for row, column in enumerate(PRICE_COLUMNS)}
+
+
+def _run_task(task: tuple, population_size: int, generations: int, seed: int):
+    ticker, strategy, start_date, end_date = task
+    prices = _slice_prices(ticker, start_date, end_date)
+    before = _worker_cache.stats()
+    population, results = optimize_strategy(
+        prices,
+        strategy,
+        population_size,
+        generations,
+        seed=seed,
+        cache=_worker_cache.scope(ticker, start_date, end_date),
+    )
+    after = _worker_cache.stats()
+    counters = {name: after[name] - before[name] for name in CACHE_COUNTERS}
+    return task, strategy_document(strategy, population, results), counters
+
+
+class Sweep:
+    """
+    Optimizes every (ticker, strategy, date range) combination in a process pool.
+
+    The results of a ticker and date range are combined into one Results
+    document, like a run submitted with several algorithms selected, once all of
+    its strategies are done. Tasks that fail, e.g. because their date range has
+    no bars, are recorded in errors and their run is stored with the strategies
+    that succeeded.
+
+    Parameters
+    prices: dict
+        {ticker: bars from load_ohlcv}, or a MarketDataStore
+    strategies: list[str]
+        Strategies to optimize
+    date_ranges: list[tuple[str, str]]
+        (start_date, end_date) pairs in YYYY-MM-DD format
+    workers: int
+        Number of worker processes, defaults to the number of cores
+    progress: callable
+        Called with (done, total, task) after every finished task
+    tickers: list[str]
+        Tickers to sweep, defaults to all tickers of prices
+    cache_bytes: int
+        Memory budget of each worker's indicator cache
+    spill_dir: str
+        Directory the indicator caches spill evicted series to, if any
+    """
+
+    def __init__(
+        self,
+        prices: dict,
+        strategies: list[str],
+        date_ranges: list[tuple[str, str]],
+        population_size: int,
+        generations: int,
+        workers: int = None,
+        progress=None,
+        seed: int = 0,
+        tickers: list[str] = None,
+        cache_bytes: int = 256 * 2**20,
+        spill_dir: str = None,
+    ) -> None:
+        self.prices = prices
+        self.strategies = strategies
+        self.date_ranges = date_ranges
+        self.population_size = population_size
+        self.generations = generations
+        self.workers = workers or os.cpu_count()
+        self.progress = progress
+        self.seed = seed
+        self.cache_options = {"max_bytes": cache_bytes, "spill_dir": spill_dir}
+        self.cache_stats = dict.fromkeys(CACHE_COUNTERS, 0)
+        # (task, error message) of every failed task
+        self.errors = []
+
+        if tickers is None:
+            tickers = prices.tickers() if isinstance(prices, MarketDataStore) else prices
+        self.tasks = [
+            (ticker, strategy, start_date, end_date)
+            for ticker in tickers
+            for start_date, end_date in date_ranges
+            for strategy in strategies
+        ]
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        # finished tasks are kept, queued tasks are dropped and running tasks
+        # are not waited for
+        self._cancelled.set()
+
+    def run(self) -> list[dict]:
+        """
+        Runs every task and returns the finished Results documents.
+        """
+        started = datetime.utcnow().replace(microsecond=0)
+        if isinstance(self.prices, MarketDataStore):
+            shared = SharedPrices({})
+            initargs = (shared.descriptor, self.cache_options, self.prices.root)
+        else:
+            shared = SharedPrices(self.prices)
+            initargs = (shared.descriptor, self.cache_options)
+        self.errors = []
+        runs = {}
+        failed = {}
+        documents = []
+        stored = set()
+        done_count = 0
+
+        def finish(task, document=None, error=None):
+            nonlocal done_count
+            done_count += 1
+            ticker, strategy, start_date, end_date = task
+            key = (ticker, start_date, end_date)
+            run = runs.setdefault(key, {})
+            if error is not None:
+                self.errors.append((task, f"{type(error).__name__}: {error}"))
+                failed[key] = failed.get(key, 0) + 1
+            else:
+                run[strategy] = document
+
+            if run and len(run) + failed.get(key, 0) == len(self.strategies):
+                store(key)
+
+            if self.progress is not None:
+                self.progress(done_count, len(self.tasks), task)
+
+        def store(key):
+            ticker, start_date, end_date = key
+            stored.add(key)
+            documents.append(
+                self._document(
+                    started, len(documents), ticker, start_date, end_date, runs[key]
+                )
+            )
+
+        # reject ranges without bars before starting any worker
+        tasks = []
+        for i, task in enumerate(self.tasks):
+            try:
+                self._check_range(task)
+            except ValueError as e:
+                finish(task, error=e)
+            else:
+                tasks.append((i, task))
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_attach,
+            initargs=initargs,
+        )
+        try:
+            futures = {
+                executor.submit(
+                    _run_task,
+                    task,
+                    self.population_size,
+                    self.generations,
+                    self.seed + i,
+                ): task
+                for i, task in tasks
+            }
+            pending = set(futures)
+
+            while pending and not self._cancelled.is_set():
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # one failed task doesn't stop the others
+                    try:
+                        task, document, counters = future.result()
+                    except Exception as e:
+                        finish(futures[future], error=e)
+                        continue
+                    for name, count in counters.items():
+                        self.cache_stats[name] += count
+                    finish(task, document)
+
+        finally:
+            # once cancelled, queued tasks are dropped and running ones are not
+            # waited for
+            cancelled = self._cancelled.is_set()
+            executor.shutdown(wait=not cancelled, cancel_futures=cancelled)
+            shared.close()
+
+        # the strategies that finished of runs cut short by the cancel
+        for key, run in runs.items():
+            if run and key not in stored:
+                store(key)
+
+        return documents
+
+    def _check_range(self, task: tuple):
+        # raises ValueError if the task's date range holds no bars
+        ticker, _, start_date, end_date = task
+        if isinstance(self.prices, MarketDataStore):
+            self.prices.rows(ticker, start_date, end_date)
+            return
+
+        if start_date > end_date:
+            raise ValueError("Start date must be before end date")
+        dates = self.prices[ticker]["date"].astype("datetime64[D]")
+        start = np.searchsorted(dates, np.datetime64(start_date, "D"), "left")
+        end = np.searchsorted(dates, np.datetime64(end_date, "D"), "right")
+        if start == end:
+            raise ValueError(f"{ticker} has no data for {start_date} to {end_date}")
+
+    def _document(self, started, index, ticker, start_date, end_date, run) -> dict:
+        # timestamps are spread by a millisecond so every document gets its own _id
+        timestamp = started + timedelta(milliseconds=index)
+        inputs = run_inputs(
+            timestamp,
+            ticker,
+            self.population_size,
+            self.generations,
+            start_date,
+            end_date,
+        )
+        inputs["input_hash"] = input_hash(
+            {
+                **inputs,
+                "selected_algos": [s in run for s in STRATEGY_PARAMS],
+            }
+        )
+        return {"_id": timestamp, "inputs": inputs, **run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data-dir", help="directory of <TICKER>.csv files")
+    source.add_argument("--store", help="market_data.store directory")
+    parser.add_argument("--tickers", nargs="+")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGY_PARAMS))
+    parser.add_argument(
+        "--ranges",
+        nargs="+",
+        default=["2011-01-01:2023-06-01"],
+        help="START:END date ranges",
+    )
+    parser.add_argument("--population-size", type=int, default=50)
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--cache-mb", type=int, default=256, help="indicator cache size per worker"
+    )
+    parser.add_argument("--spill-dir", help="directory for evicted indicators")
+    parser.add_argument("--no-save", action="store_true", help="don't write the results")
+    args = parser.parse_args()
+
+    if args.store:
+        prices = MarketDataStore(args.store)
+        tickers = [t.upper() for t in args.tickers] if args.tickers else None
+        missing = set(tickers or []) - set(prices.tickers())
+        if missing:
+            parser.error(f"not in the store: {' '.join(sorted(missing))}")
+    else:
+        if not args.tickers:
+            parser.error("--tickers is required with --data-dir")
+        tickers = args.tickers
+        prices = {
+            ticker: load_ohlcv(os.path.join(args.data_dir, f"{ticker}.csv"))
+            for ticker in args.tickers
+        }
+    date_ranges = [tuple(r.split(":", 1)) for r in args.ranges]
+
+    def progress(done, total, task):
+        print(f"[{done}/{total}] {' '.join(task)}", flush=True)
+
+    sweep = Sweep(
+        prices,
+        args.strategies,
+        date_ranges,
+        args.population_size,
+        args.generations,
+        workers=args.workers,
+        progress=progress,
+        tickers=tickers,
+        cache_bytes=args.cache_mb * 2**20,
+        spill_dir=args.spill_dir,
+    )
+
+    # Ctrl-C cancels the remaining tasks, finished ones are still saved
+    signal.signal(signal.SIGINT, lambda *_: sweep.cancel())
+    documents = sweep.run()
+    print(f"{len(documents)} runs finished")
+    for task, error in sweep.errors:
+        print(f"failed: {' '.join(task)}: {error}")
+    counters = ", ".join(f"{count} {name}" for name, count in sweep.cache_stats.items())
+    print(f"indicator cache: {counters}")
+
+    if documents and not args.no_save:
+        import database.database_controller as db
+
+        db.add_many_results(documents)
+        print(f"{len(documents)} runs saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,10 +28,11 @@ const runOptimization = async() => {
   // Disable user input/submit button while optimization is running.
   disableInputs();
 
-  // Send user inputs to optimizer.
+  // Send user inputs to optimizer. The optimization runs in the background
+  // and is polled until its results are ready.
   console.log("Data sent!");
   let acceptType = 'application/json';
-  const response = await fetch('/optimize', {
+  const jobResponse = await fetch('/optimize', {
     method: 'POST',
     headers: {
         'Content-Type': 'application/json',
@@ -40,14 +41,20 @@ const runOptimization = async() => {
     body: inputBody
   });
 
+  let response = jobResponse;
+  if (jobResponse.status == 202) {
+    const job = await jobResponse.json();
+    response = await waitForJob(job.job_id, acceptType);
+  }
+
   // Display results of optimization and update list of past optimizations.
   const resultsDiv = document.getElementById('response-results');
-  if (response.status == 201 && response.headers.get('content-type') == 'text/html') {
+  if (response.status == 200 && response.headers.get('content-type') == 'text/html') {
     const htmlResponse = await response.text();
     resultsDiv.innerHTML = htmlResponse;
   }
 
-  else if (response.status == 201 && response.headers.get('content-type') == 'application/json') {
+  else if (response.status == 200 && response.headers.get('content-type') == 'application/json') {
     const jsonResponse = await response.json();
     console.log(jsonResponse);
     storedOptimizations.unshift(jsonResponse);
@@ -66,6 +73,33 @@ const runOptimization = async() => {
   enableInputs();
 }
 
+// Polls of an optimization job, two seconds apart, after which the client
+// stops waiting for it.
+const MAX_JOB_POLLS = 3600;
+
+// Poll an optimization job until it has finished and return the response
+// holding its results, or the last answer if it is still running.
+const waitForJob = async(jobId, acceptType) => {
+  let response;
+  for (let poll = 0; poll < MAX_JOB_POLLS; poll++) {
+    await new Promise(resolve => setTimeout(resolve, 2000));
+
+    response = await fetch(`/jobs/${jobId}/result`, {
+      method: 'GET',
+      headers: {
+        'Accept': acceptType
+      },
+    });
+
+    if (response.status != 202) {
+      return response;
+    }
+  }
+
+  console.log(`Stopped waiting for optimization job ${jobId}.`);
+  return response;
+}
+
 // Display results of a prior optimization.
 const loadOptimization = async() => {
   var dropdown = document.getElementById('optimization-list');
@@ -80,6 +114,23 @@ const loadOptimization = async() => {
   // Iterate through past optimizations to find requested run. 
   for (var i = 0; i < storedOptimizations.length; i++) {
     if (storedOptimizations[i]._id == selectedValue) {
+      // The list only holds run summaries, fetch the results once on first use.
+      if ('summary' in storedOptimizations[i]) {
+        const response = await fetch(`/optimize/${encodeURIComponent(selectedValue)}`, {
+          method: 'GET',
+          headers: {
+            'Accept': 'application/json'
+          },
+        });
+        if (response.status != 200) {
+          alert("Could not load the selected optimization.");
+          return;
+        }
+        const run = await response.json();
+        run._id = selectedValue;
+        storedOptimizations[i] = run;
+      }
+
       const resultsDiv = document.getElementById('response-results');
       createPlot(resultsDiv, storedOptimizations[i]);
       return;
@@ -87,10 +138,10 @@ const loadOptimization = async() => {
   }
 }
 
-// Create dropdown list of past optimization runs.
+// Create dropdown list of past optimization runs from their summaries.
 const loadOptimizationList = async() => {
   let acceptType = 'application/json';
-  const response = await fetch('/optimize', {
+  const response = await fetch('/optimize?summary=1', {
       method: 'GET',
       headers: {
         'Accept': acceptType
@@ -134,6 +185,11 @@ function createPlot(resultsDiv, algoDict) {
       continue;
     }
 
+    // Skip anything else stored with the run that isn't a strategy.
+    if (!algoData || typeof algoData['results'] !== 'object') {
+      continue;
+    }
+
     let description = algoData['description'];
     let data = Object.values(algoData['results']).map(d => Object.values(d)[0]);
     console.log(data);
@@ -147,6 +203,10 @@ function createPlot(resultsDiv, algoDict) {
       text: data.map(d => {
         let result = '';
         for (let key in d) {
+              // The numeric parameters repeat the inputs string.
+              if (key == "params") {
+                continue;
+              }
               if (key == "inputs"){
                 result += `${d[key]}<br>`;
               } else {
@@ -411,12 +471,15 @@ function handlePlotTypeChange() {
  */
 function handleAnalyzeFormSubmit(form) {
     var formData = new FormData(form);
+    // Numeric arrays are sent as base64 typed arrays, decoded below.
+    formData.append('format', 'binary');
 
     fetch(form.action + '?' + new URLSearchParams(formData).toString(), {
         method: 'GET'
     })
     .then(response => response.json())
     .then(graphJSON => {
+        graphJSON = decodeTypedArrays(graphJSON);
         console.log('Received Graph Data:', graphJSON);
         // Clear the existing graph (if any)
         Plotly.purge('graphContainer');
@@ -426,6 +489,51 @@ function handleAnalyzeFormSubmit(form) {
     });
 }
 
+// Typed array constructors of the dtypes used in binary figure payloads.
+const TYPED_ARRAYS = {
+    f8: Float64Array,
+    f4: Float32Array,
+    i4: Int32Array,
+    u4: Uint32Array,
+    i2: Int16Array,
+    u2: Uint16Array,
+    i1: Int8Array,
+    u1: Uint8Array
+};
+
+/**
+ * Replaces the {dtype, bdata, shape} arrays of a binary figure payload with
+ * typed arrays, or arrays of typed array rows for 2-D arrays.
+ *
+ * @param {*} value - The figure, or any value nested in it.
+ * @return {*} The value with its typed arrays decoded.
+ */
+function decodeTypedArrays(value) {
+    if (Array.isArray(value)) {
+        return value.map(decodeTypedArrays);
+    }
+    if (value === null || typeof value !== 'object') {
+        return value;
+    }
+
+    if (typeof value.bdata === 'string' && value.dtype in TYPED_ARRAYS) {
+        const bytes = Uint8Array.from(atob(value.bdata), c => c.charCodeAt(0));
+        const array = new TYPED_ARRAYS[value.dtype](bytes.buffer);
+        if (!value.shape || value.shape.length < 2) {
+            return array;
+        }
+        const rowLength = array.length / value.shape[0];
+        return Array.from({length: value.shape[0]}, (_, row) =>
+            array.subarray(row * rowLength, (row + 1) * rowLength));
+    }
+
+    const decoded = {};
+    for (const [key, item] of Object.entries(value)) {
+        decoded[key] = decodeTypedArrays(item);
+    }
+    return decoded;
+}
+
 /**
  * Handles the update of results.
  *
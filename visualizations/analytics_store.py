@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+# metric columns stored as float32 to halve their memory
+METRIC_COLUMNS = [
+    "num_trades",
+    "final_equity",
+    "p_return",
+    "p_max_drawdown",
+    "p_avg_drawdown",
+    "p_winrate",
+    "sharpe_ratio",
+    "p_exposure_time",
+    "p_volatility",
+    "p_buy_hold_return",
+]
+
+
+class AnalyticsStore:
+    """
+    Processed results grouped once by (ticker, strategy).
+
+    Rows are sorted by ticker then strategy, so the rows of a ticker and of a
+    (ticker, strategy) pair are contiguous slices that are looked up in a dict
+    instead of filtering the whole DataFrame with a boolean mask. The rows of a
+    strategy are kept as an array of row positions.
+
+    Parameters
+    data: pd.DataFrame
+        Processed results, as returned by ResultsProcessing.get_processed_results
+    """
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        if data is None:
+            data = pd.DataFrame(columns=["ticker", "strategy"] + METRIC_COLUMNS)
+
+        self.data = self._compact(data)
+
+        ticker_codes = self.data["ticker"].cat.codes.to_numpy()
+        strategy_codes = self.data["strategy"].cat.codes.to_numpy()
+        tickers = self.data["ticker"].cat.categories
+        strategies = self.data["strategy"].cat.categories
+
+        self._ticker_slices = {
+            tickers[code]: rows for code, rows in _contiguous_slices(ticker_codes)
+        }
+        self._group_slices = {
+            (tickers[code // len(strategies)], strategies[code % len(strategies)]): rows
+            for code, rows in _contiguous_slices(
+                ticker_codes.astype(np.int64) * len(strategies) + strategy_codes
+            )
+        }
+        self._strategy_rows = {
+            strategy: np.flatnonzero(strategy_codes == code)
+            for code, strategy in enumerate(strategies)
+        }
+
+    @staticmethod
+    def _compact(data: pd.DataFrame) -> pd.DataFrame:
+        data = data.copy()
+        data["ticker"] = data["ticker"].astype(str).astype("category")
+        data["strategy"] = data["strategy"].astype(str).astype("category")
+
+        for column in METRIC_COLUMNS:
+            if column in data.columns:
+                data[column] = pd.to_numeric(data[column]).astype("float32")
+
+        # codes of sorted categories are sorted, so groups become contiguous
+        data["ticker"] = data["ticker"].cat.as_ordered()
+        data["strategy"] = data["strategy"].cat.as_ordered()
+        return data.sort_values(["ticker", "strategy"], kind="stable")
+
+    def tickers(self) -> list[str]:
+        return list(self._ticker_slices)
+
+    def strategies(self) -> list[str]:
+        return [s for s, rows in self._strategy_rows.items() if len(rows) > 0]
+
+    def for_ticker(self, ticker: str) -> pd.DataFrame:
+        return self.data.iloc[self._ticker_slices.get(ticker, slice(0, 0))]
+
+    def for_group(self, ticker: str, strategy: str) -> pd.DataFrame:
+        return self.data.iloc[
+            self._group_slices.get((ticker, strategy), slice(0, 0))
+        ]
+
+    def for_strategy(self, strategy: str) -> pd.DataFrame:
+        rows = self._strategy_rows.get(strategy, np.empty(0, dtype=np.int64))
+        return self.data.iloc[rows]
+
+    def memory_usage(self) -> int:
+        # bytes used by the stored DataFrame, including string contents
+        return int(self.data.memory_usage(deep=True).sum())
+
+
+def _contiguous_slices(codes: np.ndarray):
+    # yields (code, slice) for each run of equal values in a sorted array
+    if len(codes) == 0:
+        return
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    stops = np.concatenate((starts[1:], [len(codes)]))
+    for start, stop in zip(starts, stops):
+        yield int(codes[start]), slice(int(start), int(stop))
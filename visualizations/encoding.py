@@ -0,0 +1,115 @@
+import base64
+import gzip
+import json
+
+import numpy as np
+
+from instrumentation.metrics import FIGURE_BYTES, FIGURE_SERIALIZE_SECONDS
+
+
+# numpy dtypes shipped as typed arrays, by the name used in the payload
+TYPED_ARRAY_DTYPES = {
+    "f8": np.float64,
+    "f4": np.float32,
+    "i4": np.int32,
+    "u4": np.uint32,
+    "i2": np.int16,
+    "u2": np.uint16,
+    "i1": np.int8,
+    "u1": np.uint8,
+}
+
+# brotli is optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def figure_json(fig, binary: bool = False) -> str:
+    """
+    Serializes a Plotly figure to JSON.
+
+    With binary, numeric arrays are written as base64-encoded typed arrays in
+    Plotly's {"dtype", "bdata", "shape"} form instead of decimal text, which
+    static/script.js decodes before plotting.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    format = "binary" if binary else "json"
+    with FIGURE_SERIALIZE_SECONDS.time(format=format):
+        if binary:
+            payload = json.dumps(
+                _encode_arrays(fig.to_plotly_json()), cls=PlotlyJSONEncoder
+            )
+        else:
+            payload = json.dumps(fig, cls=PlotlyJSONEncoder)
+
+    FIGURE_BYTES.inc(len(payload), format=format)
+    return payload
+
+
+def typed_array(values: np.ndarray):
+    """
+    Returns the typed array form of a numeric array, or None if it has no
+    typed array equivalent (e.g. strings, dates or objects).
+    """
+    if values.dtype.kind == "f" and values.size and np.isnan(values).mean() > 0.5:
+        # mostly missing values (e.g. the parameters other strategies don't
+        # use) are shorter as JSON nulls than as 8 bytes each
+        return None
+
+    if values.dtype == np.bool_:
+        values = values.astype(np.uint8)
+    elif values.dtype.kind in "iu" and values.dtype.itemsize == 8:
+        # JavaScript has no 64-bit integer arrays that Plotly accepts
+        if values.size and (values.min() < -(2**31) or values.max() >= 2**31):
+            values = values.astype(np.float64)
+        else:
+            values = values.astype(np.int32)
+
+    for name, dtype in TYPED_ARRAY_DTYPES.items():
+        if values.dtype == dtype:
+            encoded = {
+                "dtype": name,
+                "bdata": base64.b64encode(
+                    values.astype(values.dtype.newbyteorder("<")).tobytes()
+                ).decode(),
+            }
+            if values.ndim > 1:
+                encoded["shape"] = list(values.shape)
+            return encoded
+    return None
+
+
+def _encode_arrays(value):
+    if isinstance(value, np.ndarray):
+        encoded = typed_array(value)
+        return value if encoded is None else encoded
+    if isinstance(value, dict):
+        return {key: _encode_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_arrays(item) for item in value]
+    return value
+
+
+def negotiate_encoding(accept_encodings) -> str:
+    """
+    Returns the best content encoding the client accepts, or "identity".
+
+    Parameters
+    accept_encodings: werkzeug.datastructures.Accept
+        request.accept_encodings
+    """
+    return accept_encodings.best_match(CONTENT_ENCODINGS, default="identity")
+
+
+def compress(payload: str, encoding: str) -> bytes:
+    data = payload.encode()
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    return data
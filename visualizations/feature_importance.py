@@ -0,0 +1,189 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+STRATEGIES = ["Exp/Con", "Acceleration", "Breakout", "Velocity"]
+
+# above this many rows a histogram-based gradient boosting model is fitted and
+# scored with permutation importance on a sample instead of a random forest
+ROW_THRESHOLD = 200000
+PERMUTATION_SAMPLE_SIZE = 20000
+
+GINI_IMPORTANCE = "Gini Importance (Decreased Impurity)"
+PERMUTATION_IMPORTANCE = "Permutation Importance (Normalized)"
+
+
+def prepare_features(data: pd.DataFrame):
+    """
+    Returns the features and target (final equity) of one strategy's processed
+    results, with tickers one-hot encoded.
+    """
+    tickers = data["ticker"]
+    if isinstance(tickers.dtype, pd.CategoricalDtype):
+        tickers = tickers.cat.remove_unused_categories()
+
+    data = pd.concat([data, pd.get_dummies(tickers)], axis=1)
+    x = data.drop(
+        [
+            "p_return",
+            "p_winrate",
+            "final_equity",
+            "ticker",
+            "strategy",
+            "start_date",
+            "end_date",
+        ],
+        axis=1,
+    )
+    x = x.dropna(axis=1)
+    y = data["final_equity"]
+
+    return x, y
+
+
+def fit_importances(
+    data: pd.DataFrame,
+    n_jobs: int = 1,
+    row_threshold: int = ROW_THRESHOLD,
+    sample_size: int = PERMUTATION_SAMPLE_SIZE,
+) -> dict:
+    """
+    Fits a model of final equity on one strategy's processed results and returns
+    its feature names, importances and the kind of importance computed.
+
+    Parameters
+    data: pd.DataFrame
+        Processed results of a single strategy
+    n_jobs: int
+        Number of cores the model may use
+    row_threshold: int
+        Row count above which the cheaper estimator is used
+    sample_size: int
+        Rows sampled to compute permutation importance with the cheaper estimator
+    """
+    # scikit-learn is slow to import and only needed once importances are fitted
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.inspection import permutation_importance
+
+    x, y = prepare_features(data)
+    if len(x.index) == 0 or len(x.columns) == 0:
+        return {"features": [], "importances": [], "method": GINI_IMPORTANCE}
+
+    if len(x.index) <= row_threshold:
+        regressor = RandomForestRegressor(
+            n_estimators=150, random_state=0, n_jobs=n_jobs
+        )
+        regressor.fit(x, y)
+        importances = regressor.feature_importances_
+        method = GINI_IMPORTANCE
+
+    else:
+        regressor = HistGradientBoostingRegressor(random_state=0)
+        regressor.fit(x, y)
+
+        sample = x.sample(n=min(sample_size, len(x.index)), random_state=0)
+        result = permutation_importance(
+            regressor,
+            sample,
+            y.loc[sample.index],
+            n_repeats=5,
+            random_state=0,
+            n_jobs=n_jobs,
+        )
+        # scale like Gini importances so both kinds plot the same way
+        importances = np.clip(result.importances_mean, 0, None)
+        if importances.sum() > 0:
+            importances = importances / importances.sum()
+        method = PERMUTATION_IMPORTANCE
+
+    return {
+        "features": [str(f) for f in x.columns],
+        "importances": [float(i) for i in importances],
+        "method": method,
+    }
+
+
+class FeatureImportances:
+    """
+    Feature importances of every strategy, refitted only when processed_results
+    changes.
+
+    Importances are kept in memory and persisted in the processing_state
+    collection together with the data version and estimator settings they were
+    computed for, so other processes and restarts reuse them too. Strategies are
+    fitted in parallel, sharing the available cores.
+
+    Parameters
+    state_collection:
+        Collection the importances are persisted in
+    row_threshold: int
+        Row count above which the cheaper estimator is used
+    sample_size: int
+        Rows sampled to compute permutation importance with the cheaper estimator
+    """
+
+    def __init__(
+        self,
+        state_collection,
+        row_threshold: int = ROW_THRESHOLD,
+        sample_size: int = PERMUTATION_SAMPLE_SIZE,
+    ) -> None:
+        self.state_collection = state_collection
+        self.row_threshold = row_threshold
+        self.sample_size = sample_size
+
+        self._importances = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self, data_version: int) -> dict:
+        return {
+            "data_version": data_version,
+            "row_threshold": self.row_threshold,
+            "sample_size": self.sample_size,
+        }
+
+    def get(self, store, data_version: int) -> dict:
+        """
+        Returns {strategy: {"features", "importances", "method"}} for the data
+        of the given analytics store.
+        """
+        fingerprint = self.fingerprint(data_version)
+
+        with self._lock:
+            if self._fingerprint == fingerprint:
+                return self._importances
+
+            persisted = self.state_collection.find_one({"_id": "feature_importance"})
+            if persisted is not None and persisted.get("fingerprint") == fingerprint:
+                importances = persisted["strategies"]
+            else:
+                importances = self.fit(store)
+                self.state_collection.replace_one(
+                    {"_id": "feature_importance"},
+                    {"fingerprint": fingerprint, "strategies": importances},
+                    upsert=True,
+                )
+
+            self._importances = importances
+            self._fingerprint = fingerprint
+            return importances
+
+    def fit(self, store) -> dict:
+        # the tree fitting releases the GIL, so threads are enough
+        n_jobs = max(1, (os.cpu_count() or 1) // len(STRATEGIES))
+        with ThreadPoolExecutor(max_workers=len(STRATEGIES)) as executor:
+            results = executor.map(
+                lambda strategy: fit_importances(
+                    store.for_strategy(strategy),
+                    n_jobs=n_jobs,
+                    row_threshold=self.row_threshold,
+                    sample_size=self.sample_size,
+                ),
+                STRATEGIES,
+            )
+            return dict(zip(STRATEGIES, results))
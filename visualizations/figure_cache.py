@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """
+    LRU cache of serialized Plotly figures.
+
+    Keys should include the data version the figure was built from, so figures
+    of older data are never served once processed_results changes. Entries are
+    evicted least recently used first once either max_entries or max_bytes is
+    exceeded.
+
+    Parameters
+    max_entries: int
+        Maximum number of cached figures
+    max_bytes: int
+        Maximum total size of the cached figure JSON strings
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 2**20) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(key: tuple) -> str:
+        # figures are deterministic for a key, so the ETag only depends on it
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key: tuple):
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is None:
+                self.misses += 1
+                return None
+
+            self._figures.move_to_end(key)
+            self.hits += 1
+            return figure
+
+    def put(self, key: tuple, figure: str):
+        size = len(figure)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._figures:
+                self.size_bytes -= len(self._figures.pop(key))
+
+            self._figures[key] = figure
+            self.size_bytes += size
+
+            while (
+                len(self._figures) > self.max_entries
+                or self.size_bytes > self.max_bytes
+            ):
+                _, evicted = self._figures.popitem(last=False)
+                self.size_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._figures)
@@ -0,0 +1,93 @@
+import threading
+import time
+import traceback
+
+
+class LazyVisualization:
+    """
+    Creates the TSAVisualization on first use instead of at import.
+
+    Creating it loads the whole processed_results collection, so the
+    application can start serving before that happens (plotly is only imported
+    by the first figure). warm_up starts loading in a background thread;
+    requests that need the data before it is done wait for it.
+
+    A failed load is reported by status and retried by the next get.
+    """
+
+    def __init__(self) -> None:
+        self._tsva = None
+        self._error = None
+        self._loading = False
+        self._load_time = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+
+    @property
+    def ready(self) -> bool:
+        return self._tsva is not None
+
+    def get(self):
+        """
+        Returns the TSAVisualization, loading it or waiting for the background
+        load if needed.
+        """
+        tsva = self._tsva
+        if tsva is not None:
+            return tsva
+
+        with self._lock:
+            while self._loading:
+                self._loaded.wait()
+            if self._tsva is not None:
+                return self._tsva
+            self._loading = True
+
+        return self._load()
+
+    def warm_up(self) -> threading.Thread:
+        # loads in the background, so startup doesn't wait for it
+        thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        with self._lock:
+            if self._loading or self._tsva is not None:
+                return
+            self._loading = True
+
+        try:
+            self._load()
+        except Exception:
+            traceback.print_exc()
+
+    def _load(self):
+        start = time.perf_counter()
+        tsva = None
+        try:
+            from visualizations.visualize import TSAVisualization
+
+            tsva = TSAVisualization()
+            return tsva
+
+        except Exception as e:
+            self._error = str(e)
+            raise
+
+        finally:
+            with self._lock:
+                if tsva is not None:
+                    self._tsva = tsva
+                    self._error = None
+                    self._load_time = time.perf_counter() - start
+                self._loading = False
+                self._loaded.notify_all()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "loading": self._loading,
+            "error": self._error,
+            "load_time": self._load_time,
+        }
@@ -0,0 +1,141 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# above this many points a plot shows rollups instead of every row
+POINT_THRESHOLD = 20000
+
+HISTOGRAM_BINS = 80
+QUANTILE_BUCKETS = 40
+QUANTILES = [0.1, 0.5, 0.9]
+
+
+def histogram2d(x: np.ndarray, y: np.ndarray, bins: int = HISTOGRAM_BINS) -> dict:
+    """
+    Returns the counts of points in a bins x bins grid, with the centers of the
+    x and y bins. Rows with a missing value are left out.
+    """
+    x, y = _finite(x, y)
+    if len(x) == 0:
+        return {"x": [], "y": [], "counts": np.zeros((0, 0))}
+
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    return {
+        "x": (x_edges[:-1] + x_edges[1:]) / 2,
+        "y": (y_edges[:-1] + y_edges[1:]) / 2,
+        # rows are y bins, as Plotly heatmaps expect
+        "counts": counts.T,
+    }
+
+
+def bucket_quantiles(
+    x: np.ndarray,
+    y: np.ndarray,
+    buckets: int = QUANTILE_BUCKETS,
+    quantiles: list[float] = QUANTILES,
+) -> pd.DataFrame:
+    """
+    Splits x into equal-width buckets and returns the quantiles of y in each
+    non-empty bucket, one row per bucket with its center, count and one column
+    per quantile.
+    """
+    x, y = _finite(x, y)
+    columns = ["x", "count"] + [f"q{q:g}" for q in quantiles]
+    if len(x) == 0:
+        return pd.DataFrame(columns=columns)
+
+    edges = np.linspace(x.min(), x.max(), buckets + 1)
+    codes = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, buckets - 1)
+
+    grouped = pd.Series(y).groupby(codes)
+    table = grouped.quantile(quantiles).unstack()
+    table.columns = columns[2:]
+    table.insert(0, "count", grouped.size())
+    table.insert(0, "x", (edges[:-1] + edges[1:])[table.index] / 2)
+    return table.reset_index(drop=True)
+
+
+def pareto_front(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Returns the positions of the points no other point beats on both x and y
+    (higher is better for both), ordered by x, best first.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    candidates = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+
+    # best x first, ties broken by the better y
+    order = candidates[np.lexsort((-y[candidates], -x[candidates]))]
+    best_before = np.maximum.accumulate(np.concatenate(([-np.inf], y[order])))[:-1]
+    return order[y[order] > best_before]
+
+
+def _finite(x, y):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    return x[keep], y[keep]
+
+
+class Rollups:
+    """
+    Aggregates of an AnalyticsStore, each computed once.
+
+    A Rollups object belongs to one version of the processed results, so a new
+    one is created whenever the data changes and the cached aggregates are
+    dropped with the old one.
+
+    Parameters
+    store: AnalyticsStore
+        Processed results grouped by ticker and strategy
+    """
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: tuple, compute):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        value = compute()
+        with self._lock:
+            return self._cache.setdefault(key, value)
+
+    def _rows(self, ticker: str = None, strategy: str = None) -> pd.DataFrame:
+        if ticker is not None and strategy is not None:
+            return self.store.for_group(ticker, strategy)
+        if ticker is not None:
+            return self.store.for_ticker(ticker)
+        if strategy is not None:
+            return self.store.for_strategy(strategy)
+        return self.store.data
+
+    def histogram2d(self, x: str, y: str, ticker: str = None, strategy: str = None):
+        def compute():
+            rows = self._rows(ticker, strategy)
+            return histogram2d(rows[x].to_numpy(), rows[y].to_numpy())
+
+        return self._cached(("histogram2d", x, y, ticker, strategy), compute)
+
+    def bucket_quantiles(self, x: str, y: str, ticker: str = None, strategy: str = None):
+        def compute():
+            rows = self._rows(ticker, strategy)
+            return bucket_quantiles(rows[x].to_numpy(), rows[y].to_numpy())
+
+        return self._cached(("bucket_quantiles", x, y, ticker, strategy), compute)
+
+    def pareto_front(self, x: str, y: str, ticker: str = None, strategy: str = None):
+        """
+        Returns the rows on the Pareto front of x and y, best x first.
+        """
+
+        def compute():
+            rows = self._rows(ticker, strategy)
+            return rows.iloc[pareto_front(rows[x].to_numpy(), rows[y].to_numpy())]
+
+        return self._cached(("pareto_front", x, y, ticker, strategy), compute)
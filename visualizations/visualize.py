@@ -1,46 +1,81 @@
-from pymongo.mongo_client import MongoClient
-from sklearn.ensemble import RandomForestRegressor
-from pymongo import DESCENDING
-from credentials import db_credentials
 import pandas as pd
-import plotly
-import plotly.express as px
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
-import plotly.offline as pyo
 import math
-import json
+import numpy as np
 from database.database_controller import ResultsProcessing
-from flask import Markup
+from database.schema import ALL_PARAMS, STRATEGY_PARAMS
+from visualizations.analytics_store import AnalyticsStore
+from visualizations.feature_importance import FeatureImportances, STRATEGIES
+from visualizations.rollups import POINT_THRESHOLD, Rollups
+from visualizations.encoding import figure_json
+from instrumentation.metrics import FIGURE_BUILD_SECONDS
+
+
+class DataSnapshot:
+    """
+    The data the plots are built from and its processed_results version. It is
+    never changed, update_data publishes a new one, so a request that reads it
+    once never mixes the version of one update with the data of another.
+    """
+
+    def __init__(self, version: int, store: AnalyticsStore) -> None:
+        self.version = version
+        self.store = store
+        self.rollups = Rollups(store)
 
 
 class TSAVisualization:
     def __init__(self) -> None:
-        # get processed results
-        self.data = ResultsProcessing().get_processed_results()
+        # get processed results, grouped by ticker and strategy
+        self.results_processing = ResultsProcessing()
+        self.snapshot = self._load_snapshot()
+        self.feature_importances = FeatureImportances(
+            self.results_processing.state_db_connection
+        )
 
         # dict of parameters for each strategy
-        self._param_dict = {
-            "Breakout": ["WL", "CSL", "DSL", "ATRP", "ATRM", "DB"],
-            "Acceleration": ["SW", "LW"],
-            "Velocity": ["SW", "LW", "RSI", "TSL"],
-            "Exp/Con": ["SW", "LW", "CSL", "ATRM"],
-        }
+        self._param_dict = STRATEGY_PARAMS
         # list of all parameters
-        self._all_params = [
-            "SW",
-            "LW",
-            "WL",
-            "CSL",
-            "DSL",
-            "ATRP",
-            "ATRM",
-            "DB",
-            "RSI",
-            "TSL",
-        ]
-
-    def plot_params_vs_return(self, ticker: str, strategy: str):
+        self._all_params = ALL_PARAMS
+
+    @property
+    def store(self) -> AnalyticsStore:
+        return self.snapshot.store
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self.snapshot.store.data
+
+    @property
+    def rollups(self) -> Rollups:
+        return self.snapshot.rollups
+
+    @property
+    def data_version(self) -> int:
+        # version of processed_results the plots are built from
+        return self.snapshot.version
+
+    def _load_snapshot(self) -> DataSnapshot:
+        return DataSnapshot(
+            self.results_processing.data_version,
+            AnalyticsStore(self.results_processing.get_processed_results()),
+        )
+
+    def update_data(self, incremental: bool = True):
+        """
+        Updates the processed_results collection and reloads the plotted data.
+        Requests keep using the previous snapshot until the new one is built.
+        """
+        self.results_processing.update_processed_results(incremental=incremental)
+        self.snapshot = self._load_snapshot()
+
+    @FIGURE_BUILD_SECONDS.time(plot="params_vs_return")
+    def plot_params_vs_return(
+        self,
+        ticker: str,
+        strategy: str,
+        binary: bool = False,
+        snapshot: DataSnapshot = None,
+    ):
         """
         Plots the percent return vs parameter values for each parameter in the chosen strategy for the chosen ticker.
         Produces a different plot for each parameter
@@ -50,7 +85,16 @@ class TSAVisualization:
             ETF name (e.g. TQQQ, TNA, FNGU, QQQ, etc.)
         strategy: str
             Should be either 'Exp/Con', 'Acceleration', 'Breakout' or 'Velocity'
+        binary: bool
+            Write numeric arrays as base64 typed arrays, see encoding.figure_json
+        snapshot: DataSnapshot
+            Data to plot, the current snapshot by default
         """
+        # plotly is imported by the first figure, not with the data
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
+        snapshot = snapshot or self.snapshot
 
         if strategy == "Breakout":
             rows = 2
@@ -69,22 +113,31 @@ class TSAVisualization:
 
         subplot_count = 1
 
+        trace_data = snapshot.store.for_group(ticker, strategy)
+        # too many points for the browser, plot the spread of returns instead
+        aggregate = len(trace_data) > POINT_THRESHOLD
+
         for index, param in enumerate(self._param_dict[strategy]):
             r = math.ceil(subplot_count / 3)
             c = index % 3 + 1
 
-            trace_data = self.data[self.data["ticker"] == ticker]
+            if aggregate:
+                traces = quantile_traces(
+                    snapshot.rollups.bucket_quantiles(param, "p_return", ticker, strategy),
+                    param,
+                )
+            else:
+                traces = [
+                    go.Scattergl(
+                        x=trace_data[param],
+                        y=trace_data["p_return"],
+                        mode="markers",
+                        name=param,
+                    )
+                ]
 
-            fig.add_trace(
-                go.Scatter(
-                    x=trace_data[param],
-                    y=trace_data["p_return"],
-                    mode="markers",
-                    name=param,
-                ),
-                row=r,
-                col=c,
-            )
+            for trace in traces:
+                fig.add_trace(trace, row=r, col=c)
             fig["layout"][f"xaxis{index+1}"]["title"] = param
 
             subplot_count += 1
@@ -100,11 +153,31 @@ class TSAVisualization:
         )
 
         # return graph
-        json_fig = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        json_fig = figure_json(fig, binary)
         return json_fig
 
-    def plot_drawdown_vs_return(self, ticker: str):
-        plot_data = self.data[self.data["ticker"] == ticker]
+    @FIGURE_BUILD_SECONDS.time(plot="drawdown_vs_return")
+    def plot_drawdown_vs_return(
+        self, ticker: str, binary: bool = False, snapshot: DataSnapshot = None
+    ):
+        import plotly.express as px
+        import plotly.graph_objects as go
+
+        snapshot = snapshot or self.snapshot
+        plot_data = snapshot.store.for_ticker(ticker)
+        aggregate = len(plot_data) > POINT_THRESHOLD
+
+        if aggregate:
+            # only the best trade-offs of each strategy are plotted as points,
+            # over the density of all results
+            plot_data = pd.concat(
+                [
+                    snapshot.rollups.pareto_front(
+                        "p_return", "p_max_drawdown", ticker, strategy
+                    )
+                    for strategy in snapshot.store.strategies()
+                ]
+            )
 
         fig = px.scatter(
             plot_data,
@@ -113,8 +186,26 @@ class TSAVisualization:
             color="strategy",
             hover_name="strategy",
             hover_data=self._all_params,
+            render_mode="webgl",
         )
 
+        if aggregate:
+            fig.update_traces(mode="lines+markers")
+            density = snapshot.rollups.histogram2d("p_return", "p_max_drawdown", ticker)
+            fig.add_trace(
+                go.Heatmap(
+                    x=density["x"],
+                    y=density["y"],
+                    z=np.where(density["counts"] > 0, density["counts"], np.nan),
+                    colorscale="Greys",
+                    colorbar=dict(title="Results"),
+                    name="All results",
+                    hoverinfo="z",
+                )
+            )
+            # draw the density below the Pareto fronts
+            fig.data = fig.data[-1:] + fig.data[:-1]
+
         fig.update_layout(
             title=f"Price Breakout Parameters v.s. Percent Return <br> (ticker: {ticker})",
             title_x=0.5,
@@ -126,32 +217,39 @@ class TSAVisualization:
         )
 
         # return graph
-        json_fig = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        json_fig = figure_json(fig, binary)
         return json_fig
 
-    def plot_feature_importance(self):
+    @FIGURE_BUILD_SECONDS.time(plot="feature_importance")
+    def plot_feature_importance(self, binary: bool = False, snapshot: DataSnapshot = None):
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
+        snapshot = snapshot or self.snapshot
         fig = make_subplots(
             rows=2,
             cols=2,
             vertical_spacing=0.07,
-            subplot_titles=["Exp/Con", "Acceleration", "Breakout", "Velocity"],
+            subplot_titles=STRATEGIES,
         )
         subplot_slots = [(1, 1), (1, 2), (2, 1), (2, 2)]
 
-        for slot, strat in enumerate(
-            ["Exp/Con", "Acceleration", "Breakout", "Velocity"]
-        ):
-            feature_names, values = self.get_feature_importance_data(
-                strategy=strat
-            )
+        # all strategies are fitted together, in parallel, if needed
+        importances = self.feature_importances.get(snapshot.store, snapshot.version)
+
+        for slot, strat in enumerate(STRATEGIES):
+            result = importances[strat]
             fig.add_trace(
-                go.Bar(y=feature_names, x=values, name=strat, orientation="h"),
+                go.Bar(
+                    y=result["features"],
+                    x=result["importances"],
+                    name=strat,
+                    orientation="h",
+                ),
                 row=subplot_slots[slot][0],
                 col=subplot_slots[slot][1],
             )
-            fig["layout"][f"xaxis{slot+1}"][
-                "title"
-            ] = "Gini Importance (Decreased Impurity)"
+            fig["layout"][f"xaxis{slot+1}"]["title"] = result["method"]
             fig["layout"][f"yaxis{slot+1}"]["title"] = "Features"
 
         fig.update_layout(
@@ -164,21 +262,44 @@ class TSAVisualization:
         )
 
         # return graph
-        json_fig = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        json_fig = figure_json(fig, binary)
         return json_fig
 
-    def plot_trades_vs_return(self):
-        tickers = list(self.data["ticker"].unique())
-        strats = list(self.data.strategy.unique())
+    @FIGURE_BUILD_SECONDS.time(plot="trades_vs_return")
+    def plot_trades_vs_return(self, binary: bool = False, snapshot: DataSnapshot = None):
+        import plotly.graph_objects as go
+
+        snapshot = snapshot or self.snapshot
+        tickers = snapshot.store.tickers()
+        strats = snapshot.store.strategies()
 
         fig = go.Figure()
         strategy_buttons = []
 
+        # too many points for the browser, plot the spread of returns instead
+        aggregate = len(snapshot.store.data) > POINT_THRESHOLD
+
         for i, ticker in enumerate(tickers):
-            tmp_df = self.data[self.data["ticker"] == ticker]
+            if aggregate:
+                table = snapshot.rollups.bucket_quantiles("num_trades", "p_return", ticker)
+                fig.add_trace(
+                    go.Scatter(
+                        x=table["x"],
+                        y=table["q0.5"],
+                        customdata=table[["q0.1", "q0.9", "count"]],
+                        mode="lines+markers",
+                        name=ticker,
+                        hovertemplate="Median %{y:.1f}<br>"
+                        "10th-90th percentile %{customdata[0]:.1f} to "
+                        "%{customdata[1]:.1f}<br>%{customdata[2]} results",
+                    )
+                )
+                continue
+
+            tmp_df = snapshot.store.for_ticker(ticker)
 
             fig.add_trace(
-                go.Scatter(
+                go.Scattergl(
                     x=tmp_df.num_trades,
                     y=tmp_df.p_return,
                     mode="markers",
@@ -238,29 +359,52 @@ class TSAVisualization:
         )
 
         # return graph
-        json_fig = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        json_fig = figure_json(fig, binary)
         return json_fig
 
     def get_feature_importance_data(self, strategy: str):
-        # prep data for random forest
-        data = self.data[self.data["strategy"] == strategy]
-        data = pd.concat([data, pd.get_dummies(data["ticker"])], axis=1)
-        x = data.drop(
-            [
-                "p_return",
-                "p_winrate",
-                "final_equity",
-                "ticker",
-                "strategy",
-                "start_date",
-                "end_date",
-            ],
-            axis=1,
-        )
-        x = x.dropna(axis=1)
-        y = data["final_equity"]
-
-        regressor = RandomForestRegressor(n_estimators=150, random_state=0)
-        regressor.fit(x, y)
-
-        return x.columns, regressor.feature_importances_
+        # importances are only refitted when processed_results changes
+        snapshot = self.snapshot
+        importances = self.feature_importances.get(snapshot.store, snapshot.version)
+        result = importances[strategy]
+
+        return result["features"], result["importances"]
+
+
+def quantile_traces(table: pd.DataFrame, name: str) -> list:
+    """
+    Returns the traces of the median of each bucket of a bucket_quantiles
+    table, over a band from its 10th to 90th percentile.
+    """
+    import plotly.graph_objects as go
+
+    return [
+        go.Scatter(
+            x=table["x"],
+            y=table["q0.1"],
+            mode="lines",
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo="skip",
+            legendgroup=name,
+        ),
+        go.Scatter(
+            x=table["x"],
+            y=table["q0.9"],
+            mode="lines",
+            line=dict(width=0),
+            fill="tonexty",
+            showlegend=False,
+            hoverinfo="skip",
+            legendgroup=name,
+        ),
+        go.Scatter(
+            x=table["x"],
+            y=table["q0.5"],
+            customdata=table["count"],
+            mode="lines+markers",
+            name=name,
+            legendgroup=name,
+            hovertemplate="Median %{y:.1f}<br>%{customdata} results",
+        ),
+    ]